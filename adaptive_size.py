@@ -0,0 +1,73 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+# Multiples of the model stride (32) the controller steps through
+DEFAULT_SIZE_LADDER = (256, 320, 384, 448, 512, 576, 640)
+
+
+class AdaptiveResolution:
+    """Step the inference size down/up the ladder to hold a latency target
+
+    After every `cooldown` observations the p90 of the last `window` latencies is
+    compared with the target: above it the size steps down; if the next size up
+    is predicted to stay under `headroom * target` (cost scales with pixel count)
+    it steps up. The cooldown lets the window refill at the new size before the
+    next decision, so the size does not oscillate.
+    """
+
+    def __init__(self, target_ms=100, initial_size=320, sizes=DEFAULT_SIZE_LADDER, window=30, cooldown=15,
+                 headroom=0.8):
+        self.target_ms = target_ms
+        self.sizes = sorted(sizes)
+        self.window = window
+        self.cooldown = cooldown
+        self.headroom = headroom
+
+        self._index = min(range(len(self.sizes)), key=lambda i: abs(self.sizes[i] - initial_size))
+        self._latencies = deque(maxlen=window)
+        self._since_change = 0
+        self._changes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self.sizes[self._index]
+
+    def observe(self, latency_ms):
+        """Record one measured latency at the current size; returns the size to use next"""
+        with self._lock:
+            self._latencies.append(latency_ms)
+            self._since_change += 1
+            if self._since_change < self.cooldown or len(self._latencies) < min(self.window, self.cooldown):
+                return self.sizes[self._index]
+
+            p90 = float(np.percentile(self._latencies, 90))
+            current = self.sizes[self._index]
+            if p90 > self.target_ms and self._index > 0:
+                self._step(-1)
+            elif self._index < len(self.sizes) - 1:
+                upper = self.sizes[self._index + 1]
+                if p90 * (upper / current) ** 2 < self.headroom * self.target_ms:
+                    self._step(1)
+            return self.sizes[self._index]
+
+    def _step(self, direction):
+        # Caller holds the lock
+        self._index += direction
+        self._latencies.clear()
+        self._since_change = 0
+        self._changes += 1
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            return {
+                'size': self.sizes[self._index],
+                'target_ms': self.target_ms,
+                'sizes': self.sizes,
+                'recent_p50_ms': round(float(np.percentile(latencies, 50)), 2) if latencies else None,
+                'recent_p90_ms': round(float(np.percentile(latencies, 90)), 2) if latencies else None,
+                'changes': self._changes
+            }
@@ -0,0 +1,147 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+
+# Lower runs first: live frames are served before bulk uploads
+PRIORITIES = {'live': 0, 'bulk': 1}
+
+
+class Overloaded(Exception):
+    """Request shed before it reached the model; maps to an HTTP status with Retry-After"""
+
+    status = 429
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Overloaded):
+    """The request's deadline passed while it was still waiting for the model"""
+
+    status = 503
+
+
+class Ticket:
+    """One admitted request; release() (or leaving the with block) frees its slot"""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._start = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release((time.monotonic() - self._start) * 1000)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class _Waiter:
+    def __init__(self, priority):
+        self.priority = priority
+        self.granted = False
+
+
+class AdmissionController:
+    """Bounded, prioritised admission in front of the inference engine
+
+    At most `max_concurrent` requests hold a slot at once. Up to `max_queue` more
+    wait for one, live requests ahead of bulk ones, and bulk requests may fill
+    only `max_bulk_queue` of the queue so live traffic always has room. A full
+    queue rejects at once with Overloaded (429); a request still waiting at its
+    deadline gets DeadlineExceeded (503). Both carry a Retry-After estimate from
+    recent slot hold times.
+    """
+
+    def __init__(self, max_concurrent=8, max_queue=32, max_bulk_queue=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_bulk_queue = max_queue // 2 if max_bulk_queue is None else max_bulk_queue
+
+        self._active = 0
+        self._heap = []  # (priority, arrival, waiter)
+        self._arrivals = itertools.count()
+        self._queued = dict.fromkeys(PRIORITIES, 0)
+        self._hold_ms = deque(maxlen=100)
+        self._counts = {priority: {'admitted': 0, 'rejected': 0, 'expired': 0} for priority in PRIORITIES}
+        self._cond = threading.Condition()
+
+    def retry_after(self):
+        """Seconds until a slot is likely to free up for a newly queued request"""
+        with self._cond:
+            return self._retry_after()
+
+    def _retry_after(self):
+        # Caller holds the lock
+        mean_ms = sum(self._hold_ms) / len(self._hold_ms) if self._hold_ms else 1000
+        return max(1, math.ceil(mean_ms * (len(self._heap) + 1) / self.max_concurrent / 1000))
+
+    def acquire(self, priority='bulk', deadline=None):
+        """Wait for a slot until `deadline` (time.monotonic() value, None: no limit); returns a Ticket"""
+        rank = PRIORITIES[priority]
+        with self._cond:
+            if self._active < self.max_concurrent and not self._heap:
+                self._active += 1
+                self._counts[priority]['admitted'] += 1
+                return Ticket(self)
+
+            limit = self.max_bulk_queue if priority == 'bulk' else self.max_queue
+            if len(self._heap) >= self.max_queue or self._queued[priority] >= limit:
+                self._counts[priority]['rejected'] += 1
+                raise Overloaded('Server busy, try again later', self._retry_after())
+
+            waiter = _Waiter(priority)
+            heapq.heappush(self._heap, (rank, next(self._arrivals), waiter))
+            self._queued[priority] += 1
+            while not waiter.granted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    # Give up before reaching the model: the client has stopped waiting
+                    self._heap = [entry for entry in self._heap if entry[2] is not waiter]
+                    heapq.heapify(self._heap)
+                    self._queued[priority] -= 1
+                    self._counts[priority]['expired'] += 1
+                    raise DeadlineExceeded('Request deadline passed while queued', self._retry_after())
+                self._cond.wait(remaining)
+            self._counts[priority]['admitted'] += 1
+            return Ticket(self)
+
+    def _release(self, hold_ms):
+        with self._cond:
+            self._hold_ms.append(hold_ms)
+            self._active -= 1
+            # Hand the slot straight to the highest-priority waiter
+            if self._heap:
+                _, _, waiter = heapq.heappop(self._heap)
+                self._queued[waiter.priority] -= 1
+                waiter.granted = True
+                self._active += 1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'max_bulk_queue': self.max_bulk_queue,
+                'active': self._active,
+                'queued': dict(self._queued),
+                'mean_hold_ms': round(sum(self._hold_ms) / len(self._hold_ms), 2) if self._hold_ms else None,
+                'retry_after_seconds': self._retry_after(),
+                'requests': {priority: dict(counts) for priority, counts in self._counts.items()}
+            }
+
+
+def check_deadline(deadline):
+    """Raise DeadlineExceeded if `deadline` (time.monotonic() value) has passed"""
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceeded('Request deadline passed before inference')
@@ -2,17 +2,40 @@ import os
 import time
 import threading
 import tempfile
-from flask import Flask, render_template, request, jsonify, send_from_directory, Response
+from flask import Flask, render_template, request, jsonify, send_from_directory, Response, g, make_response
 from werkzeug.utils import secure_filename
 import cv2
 import numpy as np
 from flask_cors import CORS
+try:
+    from flask_sock import Sock
+except ImportError:  # The /live WebSocket channel needs flask-sock; /process-frame works without it
+    Sock = None
 import torch
 import uuid
-import base64
-import io
-from PIL import Image
 import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from batching import BatchInferenceEngine
+from model_loader import load_model, model_version, resolve_weights
+from worker_pool import InferencePool
+from result_cache import ResultCache, cache_key
+from frames import read_frame_bytes, decode_image_bytes
+from timing import StageTimer, LatencyRegistry
+from video import iter_video_frames
+from rendering import AnnotationRenderer
+from upload_store import UploadStore
+from batch_predict import SpooledUploads, iter_batch_predictions
+from adaptive_size import AdaptiveResolution
+from motion_gate import MotionGate, frame_thumbnail
+from tracking import StreamTrackers, Tracker, gray_thumbnail, with_track_ids
+from live_stream import LiveSessions, serve_live
+from admission import AdmissionController, Overloaded, check_deadline
+from profiling import RequestProfiler
+from field_map import SurveySessions, centers_from_det, centers_from_results
+from cpu_tuning import ALLOWED_CPUS, apply_settings, autotune, current_settings, load_calibration_frames, load_cached_tuning, save_tuning
+from tiling import tiled_inference, DEFAULT_TILE_OVERLAP
+from postprocess import detections_array, summarize_detections, weed_density
 
 
 
@@ -20,21 +43,213 @@ app = Flask(__name__)
 
 
 CORS(app)  
+sock = Sock(app) if Sock is not None else None
+live_sessions = LiveSessions()
 
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp', 'mp4', 'avif', 'mov'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  
 
-model = torch.hub.load('ultralytics/yolov5', 'custom', path='best.pt')
-model.conf = 0.25  # Confidence threshold
-model.classes = [0, 1]  # Both classes (0: Weed, 1: Paddy)
+# Load once from the vendored yolov5/ checkout (or hub cache) so restarts work offline
+MODEL_WEIGHTS = 'best.pt'
+YOLOV5_DIR = 'yolov5'
+WARMUP_RUNS = 1
+# Per-endpoint inference size (multiples of 32): live frames trade detail for latency, uploads keep full size
+INFERENCE_SIZES = {'process-frame': 320, 'process-video': 640, 'predict': 640, 'predict-batch': 640}
+# Adaptive mode for live video: step the /process-frame size up/down to hold a target inference latency
+ADAPTIVE_FRAME_SIZE = True
+FRAME_LATENCY_TARGET_MS = 100
+frame_resolution = AdaptiveResolution(FRAME_LATENCY_TARGET_MS, INFERENCE_SIZES['process-frame']) if ADAPTIVE_FRAME_SIZE else None
+
+# CPU calibration: with CPU_AUTOTUNE=1 the loaded model is benchmarked at startup at several torch/OpenCV
+# thread counts and CPU affinities, and the best setting is applied. The report is cached per machine
+# and model in CPU_TUNING_CACHE, so later starts reuse it.
+CPU_AUTOTUNE = os.environ.get('CPU_AUTOTUNE', '0') == '1'
+CPU_TUNING_OBJECTIVE = 'latency'  # 'latency': fastest single live frame; 'throughput': most frames/s in batches
+CPU_TUNING_CACHE = os.path.join('cache', 'cpu_tuning.json')
+
+# Motion gating for /process-frame?stream_id=...: while the view barely changes, return the
+# previous detections instead of running the model (threshold: mean grey-level difference, 0-255)
+MOTION_GATING = True
+MOTION_THRESHOLD = 4.0
+MOTION_MAX_SKIPS = 30  # Force a fresh inference after this many skipped frames in a row
+motion_gate = MotionGate(MOTION_THRESHOLD, MOTION_MAX_SKIPS) if MOTION_GATING else None
+
+# Tracking: detections keep stable IDs across frames. The detector runs on every Nth (key)frame;
+# in between, the boxes are moved with the camera. 1 runs the detector on every frame.
+FRAME_TRACKING = True
+FRAME_KEYFRAME_INTERVAL = 3  # /process-frame?stream_id=...
+VIDEO_KEYFRAME_INTERVAL = 5  # /process-video, counted in sampled frames
+stream_trackers = StreamTrackers(FRAME_KEYFRAME_INTERVAL) if FRAME_TRACKING else None
+CONF_THRESHOLD = 0.25  # Confidence threshold
+MODEL_CLASSES = [0, 1]  # Both classes (0: Weed, 1: Paddy)
+# 'onnx' / 'onnx-int8' run best.onnx / best.int8.onnx (export_onnx.py, quantize_int8.py) with ONNX Runtime;
+# 'stand-in' needs no weights (load testing). The MODEL_BACKEND environment variable overrides it.
+MODEL_BACKEND = os.environ.get('MODEL_BACKEND', 'pytorch')
+model_kwargs = dict(weights=MODEL_WEIGHTS, yolov5_dir=YOLOV5_DIR, conf=CONF_THRESHOLD, classes=MODEL_CLASSES, warmup_runs=WARMUP_RUNS,
+                    backend=MODEL_BACKEND)
+
+def tune_cpu(model, startup):
+    """Benchmark thread/affinity settings on the loaded model (or reuse a cached report) and apply the best"""
+    size = INFERENCE_SIZES['process-frame' if CPU_TUNING_OBJECTIVE == 'latency' else 'predict']
+    # Keyed on the CPUs this process may use, which the candidates are built from
+    cpus = ALLOWED_CPUS or list(range(os.cpu_count() or 1))
+    key = f"{','.join(map(str, cpus))}:{startup['model_version']}:{MODEL_BACKEND}:{size}:{CPU_TUNING_OBJECTIVE}"
+    report = load_cached_tuning(CPU_TUNING_CACHE, key)
+    if report is not None:
+        report.update(applied=apply_settings(report['best']), cached=True)
+    else:
+        print(f"Calibrating CPU threads and affinity ({CPU_TUNING_OBJECTIVE})...")
+        report = autotune(model, load_calibration_frames(), size, CPU_TUNING_OBJECTIVE)
+        save_tuning(CPU_TUNING_CACHE, key, report)
+        report['cached'] = False
+    print(f"CPU setting: {report['best']['torch_threads']} torch threads, OpenCV threads {report['best']['cv2_threads'] or 'default'}, "
+          f"CPUs {report['best']['cpus'] or 'all'}")
+    return report
+
+# 'batch': one in-process model with micro-batching
+# 'pool': POOL_WORKERS processes, each with its own model copy, fed frames through shared memory
+INFERENCE_MODE = 'batch'
+POOL_WORKERS = 2
+
+# Micro-batching: requests arriving within the window share one forward pass
+BATCH_MAX_SIZE = 8
+BATCH_MAX_WAIT_MS = 10
+
+if INFERENCE_MODE == 'pool':
+    # Workers load their models on first use, so spawned children re-importing this module stay cheap
+    model = None
+    startup_info = {'model_version': model_version(resolve_weights(MODEL_WEIGHTS, MODEL_BACKEND)), 'backend': MODEL_BACKEND, 'mode': 'pool'}
+    inference_engine = InferencePool(POOL_WORKERS, model_kwargs)
+else:
+    model, startup_info = load_model(**model_kwargs)
+    print(f"Model ready in {startup_info['time_to_ready_seconds']:.3f}s (backend: {MODEL_BACKEND}, source: {startup_info['source']})")
+    if CPU_AUTOTUNE:
+        try:
+            startup_info['cpu_tuning'] = tune_cpu(model, startup_info)
+        except Exception as e:
+            # A failed calibration must not take the model down; keep the default thread settings
+            print(f"CPU tuning failed, keeping the default settings: {e}")
+            startup_info['cpu_tuning'] = {'error': str(e)}
+    inference_engine = BatchInferenceEngine(model, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS)
+
+# Real per-stage latency histograms, served from /metrics
+latency = LatencyRegistry()
+
+# Content-addressed cache of /predict results (memory LRU + on-disk tier that survives restarts)
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_DIR = os.path.join('cache', 'results')  # None keeps the cache in memory only
+RESULT_CACHE_MAX_DISK_BYTES = 512 * 1024 * 1024
+result_cache = ResultCache(RESULT_CACHE_MAX_BYTES, RESULT_CACHE_DIR, RESULT_CACHE_MAX_DISK_BYTES)
+
+# Annotated /predict images are drawn off the request path and served from /annotated/<name>
+# 'background': rendered right after the JSON is returned; 'lazy': only when first fetched
+ANNOTATION_MODE = 'background'
+ANNOTATION_MAX_SIDE = None  # e.g. 1280 to draw and encode a downscaled copy
+ANNOTATION_JPEG_QUALITY = None  # e.g. 80 for smaller, faster .jpg/.webp outputs
+renderer = AnnotationRenderer(UPLOAD_FOLDER, ANNOTATION_MODE == 'background', ANNOTATION_MAX_SIDE, ANNOTATION_JPEG_QUALITY)
+
+# /predict decodes each upload once in memory; keeping a copy of the original on disk is optional
+# and done by a background writer so the request never waits on it
+SAVE_UPLOADS = True
+UPLOAD_QUOTA_BYTES = 2 * 1024 ** 3
+UPLOAD_TTL_SECONDS = 7 * 24 * 3600  # Files unused for this long are removed
+UPLOAD_SWEEP_INTERVAL = 60
+# Content-addressed names, so identical uploads are stored once and same-named uploads never collide
+upload_store = UploadStore(UPLOAD_FOLDER, UPLOAD_QUOTA_BYTES, UPLOAD_TTL_SECONDS, UPLOAD_SWEEP_INTERVAL).start()
+upload_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='upload-writer')
+
+# Admission control in front of the model: at most ADMISSION_MAX_CONCURRENT requests are in the
+# pipeline at once and up to ADMISSION_MAX_QUEUE more wait, live frames ahead of uploads (which may
+# fill only half the queue). A full queue answers 429, a request still queued at its deadline 503,
+# both with Retry-After. Clients can shorten their deadline with an X-Request-Deadline-Ms header.
+ADMISSION_MAX_CONCURRENT = BATCH_MAX_SIZE
+ADMISSION_MAX_QUEUE = 32
+LIVE_DEADLINE_MS = 1000  # A live frame older than this is not worth drawing
+BULK_DEADLINE_MS = 60000
+admission = AdmissionController(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE)
+
+# Opt-in request profiling: a /predict or /process-frame request sent with X-Profile: 1 (or ?profile=1),
+# or a PROFILE_SAMPLE_RATE fraction of them, records the Python stacks of the request and inference
+# threads plus the torch operator timings of its forward pass. Traces (Chrome trace JSON and folded
+# stacks for flamegraphs) are kept in PROFILE_DIR and listed at /profiles; other requests are not profiled.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.path.join('cache', 'profiles')
+PROFILE_MAX_FILES = 50
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # When set, /profiles requires a matching X-Admin-Token header
+profiler = RequestProfiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, max_profiles=PROFILE_MAX_FILES)
+
+# Field surveys: POST /surveys opens a session; /predict and /predict-batch uploads sent with its survey_id
+# add their detections to the session's field grid (per-cell weed/paddy counts, placed by row/col or
+# lat/lon), served as a JSON or PNG heatmap from /surveys/<id>/heatmap
+SURVEY_MAX_SESSIONS = 64
+surveys = SurveySessions(SURVEY_MAX_SESSIONS)
 
 # Global variables for video streaming
 video_capture = None
 lock = threading.Lock()
 is_streaming = False
 
+def request_deadline(default_ms):
+    """time.monotonic() deadline for this request: the server default, or sooner if the client asks"""
+    client_ms = request.headers.get('X-Request-Deadline-Ms', type=float)
+    budget_ms = min(client_ms, default_ms) if client_ms and client_ms > 0 else default_ms
+    return time.monotonic() + budget_ms / 1000
+
+def overloaded_response(e):
+    response = jsonify({'error': str(e), 'status': 'error', 'retry_after': e.retry_after})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def admitted(priority, default_deadline_ms):
+    """Run the view only once admission control grants it a slot; g.deadline is its deadline"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.deadline = request_deadline(default_deadline_ms)
+            try:
+                ticket = admission.acquire(priority, g.deadline)
+            except Overloaded as e:
+                return overloaded_response(e)
+            streaming = False
+            try:
+                response = make_response(view(*args, **kwargs))
+                if response.is_streamed:
+                    # Streamed results keep the slot until the last line is sent
+                    response.call_on_close(ticket.release)
+                    streaming = True
+                return response
+            except Overloaded as e:
+                return overloaded_response(e)
+            finally:
+                if not streaming:
+                    ticket.release()
+        return wrapper
+    return decorator
+
+def profiled(endpoint):
+    """Profile the view when the request opts in (or is sampled); g.profile is the RequestProfile or None"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not profiler.wanted(request):
+                g.profile = None
+                return view(*args, **kwargs)
+            g.profile = profiler.begin(endpoint, inference_engine.profile_threads())
+            try:
+                response = make_response(view(*args, **kwargs))
+            finally:
+                summary = profiler.end(g.profile)
+            response.headers['X-Profile-Id'] = summary['id']
+            return response
+        return wrapper
+    return decorator
+
+def admin_allowed():
+    return ADMIN_TOKEN is None or request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -47,83 +262,165 @@ def allowed_video_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in {'mp4', 'avi', 'mov'}
 
+def inference_size(endpoint):
+    """Inference size for an endpoint, following the adaptive controller for live frames"""
+    if endpoint == 'process-frame' and frame_resolution is not None:
+        return frame_resolution.size
+    return INFERENCE_SIZES[endpoint]
+
+def inference_size_stats():
+    return {
+        'configured': INFERENCE_SIZES,
+        'process_frame_adaptive': frame_resolution.stats() if frame_resolution is not None else None
+    }
+
+def inference_settings(endpoint='predict'):
+    """Everything besides the image bytes that changes the detections, for cache keys"""
+    return {
+        'conf': CONF_THRESHOLD,
+        'classes': MODEL_CLASSES,
+        'size': inference_size(endpoint),
+        'model_version': startup_info['model_version']
+    }
+
+def original_url(filename):
+    return f'../static/uploads/{filename}' if SAVE_UPLOADS else None
+
+def tiling_options(req):
+    """Parse per-request tiled inference settings, or None when tiling is off"""
+    if req.values.get('tiled', '').lower() not in ('1', 'true', 'yes'):
+        return None
+    tile_size = req.values.get('tile_size', inference_size('predict'), type=int)
+    overlap = req.values.get('overlap', DEFAULT_TILE_OVERLAP, type=float)
+    return {
+        'tile_size': min(max(tile_size, 64), 4096),
+        'overlap': min(max(overlap, 0.0), 0.9)
+    }
+
 @app.route('/')
 def index():
     return render_template('index.php')
 
 
+def analyze_frame(frame_bytes, timer, stream_id=None, motion_threshold=None, deadline=None, profile=None):
+    """Run one live frame through the motion gate, tracker and model; returns (output, statistics, kind)
+
+    kind is 'inferred', 'skipped' (view unchanged, previous detections reused) or
+    'tracked' (boxes moved with the camera between keyframes). Raises ValueError
+    if the frame cannot be decoded.
+    """
+    # Per-stream motion gate and camera-shift tracking both work on a thumbnail, before the full decode
+    gated = stream_id is not None and motion_gate is not None
+    tracked = stream_id is not None and stream_trackers is not None
+    if gated or tracked:
+        with timer.stage('motion_check'):
+            thumbnail = frame_thumbnail(frame_bytes)
+            previous = motion_gate.check(stream_id, thumbnail, motion_threshold) if gated else None
+        if previous is not None:
+            output, statistics = previous
+            return output, {
+                **statistics,
+                'skipped': True,
+                'keyframe': False,
+                'motion': motion_gate.stream_stats(stream_id),
+                'tracking': stream_trackers.totals(stream_id) if tracked else None
+            }, 'skipped'
+    
+    # Between keyframes the stream's tracks are moved with the camera instead of running the model
+    if tracked:
+        tracker, tracker_lock = stream_trackers.get(stream_id)
+        with tracker_lock:
+            keyframe = tracker.needs_detection()
+        if not keyframe:
+            with timer.stage('tracking'):
+                with tracker_lock:
+                    det, track_ids = tracker.propagate(thumbnail)
+                output, statistics = summarize_detections(det)
+                with_track_ids(output, track_ids)
+            return output, {
+                **statistics,
+                'skipped': False,
+                'keyframe': False,
+                'motion': motion_gate.stream_stats(stream_id) if gated else None,
+                'tracking': stream_trackers.totals(stream_id)
+            }, 'tracked'
+    
+    # Decode straight into a BGR array
+    with timer.stage('decode'):
+        image_np = decode_image_bytes(frame_bytes)
+    if image_np is None:
+        raise ValueError('Could not decode image data')
+    
+    # Perform detection
+    size = inference_size('process-frame')
+    with timer.stage('inference'):
+        # RGB view, as on every other path (AutoShape reads arrays as RGB)
+        results = inference_engine.submit(image_np[..., ::-1], size=size, deadline=deadline, profile=profile,
+                                          priority='live')
+    timer.add_model_times(results)
+    if frame_resolution is not None:
+        frame_resolution.observe(timer.stages['inference'])
+    
+    # Vectorized post-processing shared by every endpoint
+    with timer.stage('postprocess'):
+        det = detections_array(results)
+        if tracked:
+            with tracker_lock:
+                det, track_ids = tracker.update(det, thumbnail, image_np.shape[1::-1])
+        output, statistics = summarize_detections(det)
+        if tracked:
+            with_track_ids(output, track_ids)
+    statistics['inference_size'] = size
+    if gated:
+        motion_gate.update(stream_id, thumbnail, output, statistics)
+    
+    return output, {
+        **statistics,
+        'skipped': False,
+        'keyframe': True,
+        'motion': motion_gate.stream_stats(stream_id) if gated else None,
+        'tracking': stream_trackers.totals(stream_id) if tracked else None
+    }, 'inferred'
+
+
 @app.route('/process-frame', methods=['POST'])
+@profiled('process-frame')
+@admitted('live', LIVE_DEADLINE_MS)
 def process_frame():
     try:
-        data = request.get_json()
-        if not data or 'image' not in data:
-            return jsonify({'error': 'No image data provided'}), 400
-        
-        # Decode the base64 image
-        header, encoded = data['image'].split(",", 1)
-        image_data = base64.b64decode(encoded)
-        image = Image.open(io.BytesIO(image_data))
-        image_np = np.array(image)
+        timer = StageTimer()
         
-        # Convert RGB to BGR for OpenCV
-        if image_np.shape[2] == 3:  # RGB image
-            image_np = image_np[:, :, ::-1].copy()
-        
-        # Perform detection
-        results = model(image_np)
-        
-        # Process results
-        output = []
-        paddy_count = 0
-        weed_count = 0
+        # Read raw bytes, multipart or base64 JSON from the request
+        with timer.stage('upload_read'):
+            frame_bytes = read_frame_bytes(request)
+        if frame_bytes is None:
+            return jsonify({'error': 'No image data provided'}), 400
         
-        detections = results.pandas().xyxy[0]  # Results in pandas DataFrame
+        stream_id = request.args.get('stream_id') or request.headers.get('X-Stream-Id')
+        try:
+            output, statistics, kind = analyze_frame(frame_bytes, timer, stream_id,
+                                                     request.args.get('motion_threshold', type=float), g.deadline, g.profile)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Overloaded as e:
+            return overloaded_response(e)
         
-        for idx, detection in detections.iterrows():
-            class_id = int(detection['class'])
-            confidence = float(detection['confidence'])
-            x1, y1 = int(detection['xmin']), int(detection['ymin'])
-            x2, y2 = int(detection['xmax']), int(detection['xmax'])
-            
-            width = x2 - x1
-            height = y2 - y1
-            center_x = x1 + width/2
-            center_y = y1 + height/2
-            
-            if class_id == 0:
-                class_name = 'Weed'
-                weed_count += 1
-            else:
-                class_name = 'Paddy'
-                paddy_count += 1
-            
-            output.append({
-                'class': class_name,
-                'confidence': round(confidence, 2),
-                'bbox': [round(center_x, 2), round(center_y, 2), round(width, 2), round(height, 2)]
+        with timer.stage('serialize'):
+            response = jsonify({
+                'status': 'success',
+                'results': output,
+                'statistics': {**statistics, 'timings_ms': timer.as_dict()}
             })
-        
-        # Calculate weed density
-        total_plants = paddy_count + weed_count
-        weed_density = round((weed_count / total_plants) * 100, 2) if total_plants > 0 else 0
-        
-        return jsonify({
-            'status': 'success',
-            'results': output,
-            'statistics': {
-                'paddy_count': paddy_count,
-                'weed_count': weed_count,
-                'total_objects': total_plants,
-                'weed_density': weed_density,
-                'avg_confidence': sum(r['confidence'] for r in output) / len(output) if output else 0
-            }
-        })
+        latency.observe('process-frame' if kind == 'inferred' else f'process-frame-{kind}', timer)
+        return response
     
     except Exception as e:
         return jsonify({'error': str(e), 'status': 'error'}), 500
 
 
 @app.route('/predict', methods=['POST'])
+@profiled('predict')
+@admitted('bulk', BULK_DEADLINE_MS)
 def predict():
     print("Received request")
     if 'file' not in request.files:
@@ -134,88 +431,249 @@ def predict():
         return jsonify({'error': 'No selected file'}), 400
     
     if file and allowed_image_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Perform prediction with YOLOv5
-        results = model(filepath)
+        timer = StageTimer()
+        with timer.stage('upload_read'):
+            image_bytes = file.read()
+        filename = upload_store.original_name(image_bytes, file.filename)
+        filepath = upload_store.path(filename)
         
-        # Initialize counters for statistics
-        paddy_count = 0
-        weed_count = 0
+        # Optional survey session: the detections are also binned into its field heatmap
+        survey = placement = None
+        if request.values.get('survey_id'):
+            survey = surveys.get(request.values['survey_id'])
+            if survey is None:
+                return jsonify({'error': 'Unknown survey_id', 'status': 'error'}), 404
+            try:
+                placement = survey.placement(request.values, image_bytes, file.filename)
+            except ValueError as e:
+                return jsonify({'error': str(e), 'status': 'error'}), 400
         
-        # Process results (YOLOv5 format)
-        output = []
+        # Optional tiled mode for large drone imagery: ?tiled=1&tile_size=640&overlap=0.2
+        tiling = tiling_options(request)
         
-        # Convert the image for visualization
-        img = cv2.imread(filepath)
+        # Repeated uploads of the same image return the stored detections and annotated image
+        size = inference_size('predict')
+        key = cache_key(image_bytes, {**inference_settings('predict'), 'tiling': tiling})
+        cached = result_cache.get(key)
+        if cached is not None and cached['output_filename'] and renderer.available(cached['output_filename']):
+            upload_store.touch(cached['filename'])
+            survey_stats = survey.add(*centers_from_results(cached['results']), placement) if survey is not None else None
+            with timer.stage('serialize'):
+                response = jsonify({
+                    'original': original_url(cached['filename']),
+                    'predicted': f"../annotated/{cached['output_filename']}",
+                    'results': cached['results'],
+                    'statistics': {**cached['statistics'], 'timings_ms': timer.as_dict()},
+                    'survey': survey_stats,
+                    'cached': True,
+                    'status': 'success'
+                })
+            latency.observe('predict', timer)
+            return response
         
-        # Get detections
-        detections = results.pandas().xyxy[0]  # Results in pandas DataFrame
+        # Decode once: the same array feeds inference and the annotated image
+        with timer.stage('decode'):
+            img = decode_image_bytes(image_bytes) if image_bytes else None
+        if img is None:
+            return jsonify({'error': 'Could not decode the uploaded image'}), 400
+        if SAVE_UPLOADS:
+            upload_writer.submit(upload_store.save, filename, image_bytes)
         
-        for idx, detection in detections.iterrows():
-            class_id = int(detection['class'])
-            confidence = float(detection['confidence'])
-            x1, y1 = int(detection['xmin']), int(detection['ymin'])
-            x2, y2 = int(detection['xmax']), int(detection['ymax'])
-            
-            # Calculate center, width, height (for compatibility with your expected output)
-            width = x2 - x1
-            height = y2 - y1
-            center_x = x1 + width/2
-            center_y = y1 + height/2
-            
-            # Get class name (note: in YOLOv5 model, 0: Weed, 1: Paddy)
-            if class_id == 0:
-                class_name = 'Weed'
-                weed_count += 1
-                color = (0, 0, 255)  # Red for weeds
-            else:
-                class_name = 'Paddy'
-                paddy_count += 1
-                color = (0, 255, 0)  # Green for paddy
-            
-            # Draw bounding box
-            cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
-            
-            # Add label
-            label = f"{class_name}: {confidence:.2f}"
-            cv2.putText(img, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-            
-            output.append({
-                'class': class_name,
-                'confidence': round(confidence, 2),
-                'bbox': [round(center_x, 2), round(center_y, 2), round(width, 2), round(height, 2)]
-            })
+        if tiling:
+            # Slice the full-resolution image into overlapping tiles and merge across seams
+            with timer.stage('inference'):
+                det, tile_count = tiled_inference(inference_engine, img, tiling['tile_size'], tiling['overlap'], size=size,
+                                                  deadline=g.deadline, profile=g.profile, max_in_flight=BATCH_MAX_SIZE)
+        else:
+            # Perform prediction with YOLOv5 on an RGB view, as AutoShape reads image files
+            with timer.stage('inference'):
+                results = inference_engine.submit(img[..., ::-1], size=size, deadline=g.deadline, profile=g.profile)
+                det = detections_array(results)
+            timer.add_model_times(results)
         
-        # Save the output image
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], 'predicted_' + filename)
-        cv2.imwrite(output_path, img)
+        with timer.stage('postprocess'):
+            output, statistics = summarize_detections(det)
+            statistics['inference_size'] = size
+            if tiling:
+                statistics['tiles'] = tile_count
+            survey_stats = survey.add(*centers_from_det(det), placement) if survey is not None else None
         
-        # Calculate weed density if any plants are detected
-        weed_density = 0
-        total_plants = paddy_count + weed_count
-        if total_plants > 0:
-            weed_density = round((weed_count / total_plants) * 100, 2)
+        # The annotated image is drawn after the JSON goes out (or when first fetched)
+        output_filename = upload_store.annotated_name(key, file.filename)
+        renderer.schedule(output_filename, filepath if SAVE_UPLOADS else None, det, img)
         
-        return jsonify({
-            'original': f'../static/uploads/{filename}',
-            'predicted': f'../static/uploads/predicted_{filename}',
+        result_cache.put(key, {
+            'filename': filename,
+            'output_filename': output_filename,
             'results': output,
-            'statistics': {
-                'paddy_count': paddy_count,
-                'weed_count': weed_count,
-                'total_objects': total_plants,
-                'weed_density': weed_density,
-                'avg_confidence': sum(r['confidence'] for r in output) / len(output) if output else 0
-            },
-            'status': 'success'
+            'statistics': statistics
         })
+        
+        with timer.stage('serialize'):
+            response = jsonify({
+                'original': original_url(filename),
+                'predicted': f'../annotated/{output_filename}',
+                'results': output,
+                'statistics': {**statistics, 'timings_ms': timer.as_dict()},
+                'survey': survey_stats,
+                'cached': False,
+                'status': 'success'
+            })
+        latency.observe('predict', timer)
+        return response
     
     return jsonify({'error': 'Invalid file type'}), 400
 
 
+@app.route('/process-video', methods=['POST'])
+@admitted('bulk', BULK_DEADLINE_MS)
+def process_video():
+    """Decode an uploaded video server-side and stream per-frame detections as NDJSON"""
+    file = request.files.get('file') or request.files.get('video')
+    if file is None:
+        return jsonify({'error': 'No file uploaded'}), 400
+    if file.filename == '':
+        return jsonify({'error': 'No selected file'}), 400
+    if not allowed_video_file(file.filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+    
+    # Sample every Nth frame (?stride=N) or at a target rate (?fps=N)
+    stride = request.values.get('stride', type=int)
+    sample_fps = request.values.get('fps', type=float)
+    
+    # cv2.VideoCapture needs a real file, so spool the upload to a temp file
+    suffix = '.' + file.filename.rsplit('.', 1)[1].lower()
+    fd, video_path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, 'wb') as f:
+        file.save(f)
+    
+    video_size = inference_size('process-video')
+    # Run the detector on every Nth sampled frame (?keyframe_interval=N) and track in between
+    tracker = Tracker(request.values.get('keyframe_interval', VIDEO_KEYFRAME_INTERVAL, type=int))
+    deadline = g.deadline  # Captured here: the generator runs after the request context is gone
+    
+    def generate():
+        frames_processed = 0
+        paddy_total = 0
+        weed_total = 0
+        try:
+            for frame_index, timestamp, frame in iter_video_frames(video_path, stride, sample_fps):
+                # Stop feeding the model once the request's budget is spent; the stream ends with an error line
+                check_deadline(deadline)
+                timer = StageTimer()
+                keyframe = tracker.needs_detection()
+                with timer.stage('tracking'):
+                    thumbnail = gray_thumbnail(frame)
+                if keyframe:
+                    with timer.stage('inference'):
+                        results = inference_engine.submit(frame[..., ::-1], size=video_size, deadline=deadline,
+                                                          priority='bulk')  # VideoCapture frames are BGR
+                    timer.add_model_times(results)
+                with timer.stage('postprocess'):
+                    if keyframe:
+                        det, track_ids = tracker.update(detections_array(results), thumbnail, frame.shape[1::-1])
+                    else:
+                        det, track_ids = tracker.propagate(thumbnail)
+                    output, statistics = summarize_detections(det)
+                    with_track_ids(output, track_ids)
+                statistics['inference_time'] = round(timer.stages.get('inference', 0) / 1000, 4)
+                statistics['inference_size'] = video_size
+                statistics['keyframe'] = keyframe
+                latency.observe('process-video', timer)
+                
+                frames_processed += 1
+                if keyframe:
+                    paddy_total += statistics['paddy_count']
+                    weed_total += statistics['weed_count']
+                
+                yield json.dumps({
+                    'type': 'frame',
+                    'frame_index': frame_index,
+                    'timestamp': round(timestamp, 3) if timestamp is not None else None,
+                    'results': output,
+                    'statistics': statistics
+                }) + '\n'
+            
+            yield json.dumps({
+                'type': 'summary',
+                'frames_processed': frames_processed,
+                'paddy_detections': paddy_total,
+                'weed_detections': weed_total,
+                **tracker.totals(),
+                'weed_density': weed_density(weed_total, paddy_total),
+                'status': 'success'
+            }) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e), 'status': 'error'}) + '\n'
+        finally:
+            os.remove(video_path)
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@app.route('/predict-batch', methods=['POST'])
+@admitted('bulk', BULK_DEADLINE_MS)
+def predict_batch():
+    """Run many images (multipart files and/or .zip archives) in batches and stream per-image results as NDJSON"""
+    batch_size = min(max(request.values.get('batch_size', BATCH_MAX_SIZE, type=int), 1), 64)
+    settings = inference_settings('predict-batch')
+    
+    # Optional survey session: images are placed by file name (r3_c12.jpg) or EXIF GPS
+    survey = None
+    if request.values.get('survey_id'):
+        survey = surveys.get(request.values['survey_id'])
+        if survey is None:
+            return jsonify({'error': 'Unknown survey_id', 'status': 'error'}), 404
+    shared_placement = {name: request.values[name] for name in ('footprint_m', 'heading') if name in request.values}
+    placements = {}  # Upload index -> placement, or why the image could not be placed
+    
+    # Copy the uploads out now: the request's files are closed before the response is streamed
+    try:
+        uploads = SpooledUploads(request)
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f'Could not read uploads: {e}', 'status': 'error'}), 400
+    
+    def placed_uploads():
+        for index, (name, image_bytes) in enumerate(uploads):
+            if survey is not None:
+                try:
+                    placements[index] = survey.placement(shared_placement, image_bytes or b'', name)
+                except ValueError as e:
+                    placements[index] = e
+            yield name, image_bytes
+    
+    def generate():
+        try:
+            for record in iter_batch_predictions(inference_engine, placed_uploads(), batch_size,
+                                                 result_cache, settings, settings['size']):
+                if survey is not None and record['type'] == 'image':
+                    placement = placements.pop(record['index'])
+                    if isinstance(placement, ValueError):
+                        record['survey_error'] = str(placement)
+                    elif record['status'] == 'success':
+                        survey.add(*centers_from_results(record['results']), placement)
+                elif survey is not None and record['type'] == 'summary':
+                    record['survey'] = survey.stats()
+                yield json.dumps(record) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e), 'status': 'error'}) + '\n'
+        finally:
+            uploads.cleanup()
+    
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.call_on_close(uploads.cleanup)  # Also when the client goes away before streaming starts
+    return response
+
+
+@app.route('/annotated/<path:filename>')
+def serve_annotated(filename):
+    # Renders a pending annotated image on first fetch; plain uploads are served as-is
+    filename = secure_filename(filename)
+    if renderer.ensure(filename) is None:
+        return jsonify({'error': 'Image not found', 'status': 'error'}), 404
+    upload_store.touch(filename)
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+
 @app.route('/static/<path:path>')
 def serve_static(path):
     return send_from_directory('static', path)
@@ -226,9 +684,127 @@ def model_info():
     return jsonify({
         'model_name': 'Weed and Paddy Detector',
         'classes': ['Weed', 'Paddy'],
-        'description': 'This model detects paddy (rice) plants and weeds in paddy fields.'
+        'description': 'This model detects paddy (rice) plants and weeds in paddy fields.',
+        'startup': startup_info
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # ?format=prometheus returns scrape-friendly text instead of JSON
+    if request.args.get('format') == 'prometheus':
+        return Response(latency.prometheus_text(), mimetype='text/plain; version=0.0.4')
+    return jsonify({'latency': latency.snapshot(), 'result_cache': result_cache.stats(), 'annotations': renderer.stats(),
+                    'uploads': upload_store.stats(), 'inference_sizes': inference_size_stats(), 'admission': admission.stats(), 'status': 'success'})
+
+def live_frame_processor(stream_id, motion_threshold=None):
+    # Same pipeline as /process-frame, for frames arriving over the /live WebSocket
+    def process(frame_bytes):
+        timer = StageTimer()
+        deadline = time.monotonic() + LIVE_DEADLINE_MS / 1000
+        with admission.acquire('live', deadline):
+            output, statistics, kind = analyze_frame(frame_bytes, timer, stream_id, motion_threshold, deadline)
+        latency.observe('live' if kind == 'inferred' else f'live-{kind}', timer)
+        return {'results': output, 'statistics': {**statistics, 'timings_ms': timer.as_dict()}}
+    return process
+
+if sock is not None:
+    @sock.route('/live')
+    def live(ws):
+        """Persistent live-frame channel: only the newest frame per client is processed, stale ones are dropped"""
+        stream_id = request.args.get('stream_id') or uuid.uuid4().hex[:12]
+        session = live_sessions.open(stream_id)
+        try:
+            serve_live(ws, session, live_frame_processor(stream_id, request.args.get('motion_threshold', type=float)))
+        finally:
+            live_sessions.close(session)
+
+@app.route('/live-stats', methods=['GET'])
+def live_stats():
+    # Per-client FPS, dropped frames and end-to-end latency of the /live WebSocket channel
+    return jsonify({'enabled': sock is not None, **live_sessions.stats()})
+
+@app.route('/streams', methods=['GET'])
+def stream_stats():
+    # Per-stream motion gating (threshold, frames, skipped, skip ratio) and unique tracked totals
+    return jsonify({
+        'motion_gating': motion_gate.stats() if motion_gate is not None else None,
+        'tracking': stream_trackers.stats() if stream_trackers is not None else None
     })
 
+@app.route('/profiles', methods=['GET'])
+def list_profiles():
+    # Recorded request profiles, newest first: id, endpoint, duration, stack samples and top torch ops
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    return jsonify({'profiles': profiler.list(), 'sample_rate': PROFILE_SAMPLE_RATE, 'status': 'success'})
+
+@app.route('/profiles/<path:filename>', methods=['GET'])
+def download_profile(filename):
+    # Chrome trace (.trace.json: chrome://tracing, Perfetto) or folded stacks (.folded: flamegraph.pl, speedscope)
+    if not admin_allowed():
+        return jsonify({'error': 'Forbidden', 'status': 'error'}), 403
+    return send_from_directory(os.path.abspath(PROFILE_DIR), secure_filename(filename), as_attachment=True)
+
+@app.route('/surveys', methods=['POST'])
+def create_survey():
+    # Open a survey session: name, mode ('grid': images placed by row/col, 'geo': by lat/lon), cell_size, footprint_m
+    options = request.get_json(silent=True) or request.values
+    try:
+        survey = surveys.create(
+            name=options.get('name'),
+            mode=options.get('mode', 'grid'),
+            cell_size=float(options['cell_size']) if options.get('cell_size') else None,
+            footprint_m=float(options['footprint_m']) if options.get('footprint_m') else None
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 400
+    return jsonify({**survey.stats(), 'status': 'success'}), 201
+
+@app.route('/surveys', methods=['GET'])
+def list_surveys():
+    # Open survey sessions with their image and plant totals
+    return jsonify({'surveys': surveys.list(), 'status': 'success'})
+
+@app.route('/surveys/<survey_id>/heatmap', methods=['GET'])
+def survey_heatmap(survey_id):
+    # Per-cell weed/paddy counts and weed density; ?format=sparse lists occupied cells only
+    survey = surveys.get(survey_id)
+    if survey is None:
+        return jsonify({'error': 'Unknown survey_id', 'status': 'error'}), 404
+    return jsonify({**survey.heatmap(sparse=request.args.get('format') == 'sparse'), 'status': 'success'})
+
+@app.route('/surveys/<survey_id>/heatmap.png', methods=['GET'])
+def survey_heatmap_png(survey_id):
+    # Heatmap of one layer (?layer=density|weed|paddy|plants, optional cell_px) as a PNG
+    survey = surveys.get(survey_id)
+    if survey is None:
+        return jsonify({'error': 'Unknown survey_id', 'status': 'error'}), 404
+    layer = request.args.get('layer', 'density')
+    if layer not in ('density', 'weed', 'paddy', 'plants'):
+        return jsonify({'error': 'layer must be density, weed, paddy or plants', 'status': 'error'}), 400
+    cell_px = request.args.get('cell_px', type=int)
+    png = survey.render_png(layer, cell_px=min(max(cell_px, 1), 64) if cell_px else None)
+    if png is None:
+        return jsonify({'error': 'Survey has no detections yet', 'status': 'error'}), 404
+    return Response(png, mimetype='image/png')
+
+@app.route('/surveys/<survey_id>', methods=['DELETE'])
+def delete_survey(survey_id):
+    if not surveys.remove(survey_id):
+        return jsonify({'error': 'Unknown survey_id', 'status': 'error'}), 404
+    return jsonify({'status': 'success'})
+
+@app.route('/batch-stats', methods=['GET'])
+def batch_stats():
+    return jsonify(inference_engine.stats())
+
+@app.route('/worker-stats', methods=['GET'])
+def worker_stats():
+    # Per-worker utilization, task counts and restarts (pool mode only)
+    if INFERENCE_MODE != 'pool':
+        return jsonify({'error': 'Worker pool is not enabled', 'status': 'error'}), 404
+    return jsonify(inference_engine.stats())
+
 if __name__ == '__main__':
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
     app.run(debug=True, port=8800)
@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from frames import decode_image_bytes
+from postprocess import detections_array, summarize_detections, weed_density
+from result_cache import cache_key
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+ZIP_MIMETYPES = ('application/zip', 'application/x-zip-compressed')
+MAX_ZIP_MEMBER_BYTES = 64 * 1024 * 1024  # Guards against decompression bombs
+
+
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def _iter_zip(fileobj):
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            # Skip folders and macOS resource forks
+            if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith('._'):
+                continue
+            if _is_image(name):
+                yield name, archive.read(info) if info.file_size <= MAX_ZIP_MEMBER_BYTES else None
+
+
+class SpooledUploads:
+    """Multipart files and/or zip archives copied out of the request while it is still open
+
+    Multipart parts named 'files', 'file' or 'images' may be images or .zip archives;
+    a raw application/zip body is accepted too. Werkzeug closes the request's files once the view returns, before a streamed
+    response is generated, so a streaming view must not read them lazily. Iterating
+    yields (name, image bytes) one image at a time from the spooled copies;
+    cleanup() deletes them.
+    """
+
+    def __init__(self, request):
+        self.directory = tempfile.mkdtemp(prefix='predict-batch-')
+        self._parts = []  # (name, path, is_zip)
+        try:
+            self._spool(request)
+        except Exception:
+            self.cleanup()
+            raise
+
+    def _spool(self, request):
+        if request.mimetype in ZIP_MIMETYPES:
+            path = os.path.join(self.directory, '0.zip')
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(request.stream, f)
+            self._parts.append(('upload.zip', path, True))
+            return
+
+        for field in ('files', 'file', 'images'):
+            for file in request.files.getlist(field):
+                is_zip = file.filename.lower().endswith('.zip')
+                if not (is_zip or _is_image(file.filename)):
+                    continue
+                path = os.path.join(self.directory, str(len(self._parts)))
+                file.save(path)
+                self._parts.append((file.filename, path, is_zip))
+
+    def __len__(self):
+        return len(self._parts)
+
+    def __iter__(self):
+        for name, path, is_zip in self._parts:
+            if is_zip:
+                with open(path, 'rb') as f:
+                    yield from _iter_zip(f)
+            else:
+                with open(path, 'rb') as f:
+                    yield name, f.read()
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_batch_predictions(engine, uploads, batch_size=8, cache=None, settings=None, size=None):
+    """Run uploads through the engine `batch_size` images at a time and yield one record per image, then a summary
+
+    Each chunk is queued on the engine at once so it runs as full forward passes;
+    only one chunk of decoded images is held in memory. Results already in
+    `cache` (keyed like /predict) skip inference.
+    """
+    start = time.perf_counter()
+    processed = failed = cached_hits = 0
+    weed_total = paddy_total = 0
+    index = 0
+
+    for chunk in _chunks(uploads, batch_size):
+        records = []
+        pending = []  # (record, key, RGB view) waiting for inference
+        for name, image_bytes in chunk:
+            record = {'type': 'image', 'index': index, 'filename': name}
+            index += 1
+            records.append(record)
+
+            key = cache_key(image_bytes, {**(settings or {}), 'tiling': None}) if cache is not None else None
+            hit = cache.get(key) if key is not None else None
+            if hit is not None:
+                record.update(results=hit['results'], statistics=hit['statistics'], cached=True, status='success')
+                continue
+
+            img = decode_image_bytes(image_bytes) if image_bytes else None
+            if img is None:
+                record.update(error='Empty, oversized or undecodable image', status='error')
+                continue
+            pending.append((record, key, img[..., ::-1]))
+
+        if pending:
+            chunk_start = time.perf_counter()
+            try:
+                results = engine.submit_many([image for _, _, image in pending], size=size)
+            except Exception as e:
+                results = [e] * len(pending)
+            per_image_ms = (time.perf_counter() - chunk_start) * 1000 / len(pending)
+
+            for (record, key, _), result in zip(pending, results):
+                if isinstance(result, Exception):
+                    record.update(error=str(result), status='error')
+                    continue
+                output, statistics = summarize_detections(detections_array(result))
+                statistics['inference_time'] = round(per_image_ms / 1000, 4)
+                statistics['inference_size'] = size
+                record.update(results=output, statistics=statistics, cached=False, status='success')
+                if key is not None:
+                    cache.put(key, {'filename': None, 'output_filename': None, 'results': output,
+                                    'statistics': statistics})
+
+        for record in records:
+            if record['status'] == 'success':
+                processed += 1
+                cached_hits += record['cached']
+                weed_total += record['statistics']['weed_count']
+                paddy_total += record['statistics']['paddy_count']
+            else:
+                failed += 1
+            yield record
+
+    elapsed = time.perf_counter() - start
+    yield {
+        'type': 'summary',
+        'images_processed': processed,
+        'images_failed': failed,
+        'cached': cached_hits,
+        'weed_detections': weed_total,
+        'paddy_detections': paddy_total,
+        'weed_density': weed_density(weed_total, paddy_total),
+        'elapsed_seconds': round(elapsed, 3),
+        'images_per_second': round(processed / elapsed, 2) if elapsed else 0,
+        'status': 'success'
+    }
@@ -0,0 +1,149 @@
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from admission import PRIORITIES, DeadlineExceeded
+from profiling import record_torch_ops
+
+
+# Sorts after every request, so the worker only reaches it once queued work has finished
+_STOP = (len(PRIORITIES), 0, None)
+
+
+class BatchInferenceEngine:
+    """Collect requests arriving within a short window and run them as one batched forward pass
+
+    The queue is ordered by priority (admission.PRIORITIES), then arrival, so live
+    frames are picked ahead of bulk images already waiting, such as the tiles of a
+    large upload.
+    """
+
+    def __init__(self, model, max_batch_size=8, max_wait_ms=10):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue = queue.PriorityQueue()
+        self._arrivals = itertools.count(1)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._last_batch_size = 0
+        self._max_seen_batch_size = 0
+        self._expired = 0
+
+        self._running = True
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, name='batch-inference', daemon=True)
+        self._worker.start()
+
+    def _enqueue(self, image, size, deadline, profile, priority):
+        if self._stopped:
+            raise RuntimeError('Batch inference engine is stopped')
+        future = Future()
+        self._queue.put((PRIORITIES[priority], next(self._arrivals), (image, size, future, deadline, profile)))
+        return future
+
+    def submit(self, image, timeout=None, size=None, deadline=None, profile=None, priority='bulk'):
+        """Queue one image (path or array) and block until its detections are ready
+
+        `size` is the inference size (None: the model default); requests share a
+        forward pass only with others of the same size. A request still queued at
+        `deadline` (time.monotonic() value) fails with DeadlineExceeded instead of
+        reaching the model. With a RequestProfile as `profile`, the torch operators
+        of the forward pass that includes the image are recorded into it. `priority`
+        is 'live' or 'bulk'; live images are taken from the queue first.
+        """
+        return self._enqueue(image, size, deadline, profile, priority).result(timeout=timeout)
+
+    def submit_many(self, images, timeout=None, size=None, deadline=None, profile=None, priority='bulk'):
+        """Queue several images at once so they fill whole batches, and wait for all of them"""
+        futures = [self._enqueue(image, size, deadline, profile, priority) for image in images]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _collect_batch(self):
+        # Block for the first request, then keep collecting until the window closes
+        _, _, first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                _, _, item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while self._running:
+            batch = self._collect_batch()
+            if not batch:
+                break
+
+            # One forward pass per inference size in the window, then split per image
+            groups = {}
+            expired = 0
+            now = time.monotonic()
+            for image, size, future, deadline, profile in batch:
+                if deadline is not None and now > deadline:
+                    # The client has stopped waiting; do not spend model time on it
+                    expired += 1
+                    future.set_exception(DeadlineExceeded('Request deadline passed before inference'))
+                    continue
+                groups.setdefault(size, []).append((image, future, profile))
+            for size, items in groups.items():
+                images = [image for image, _, _ in items]
+                profiles = list({id(profile): profile for _, _, profile in items if profile is not None}.values())
+                try:
+                    with record_torch_ops(profiles, 'batch-inference'):
+                        results = (self.model(images, size=size) if size else self.model(images)).tolist()
+                except Exception as e:
+                    for _, future, _ in items:
+                        future.set_exception(e)
+                    continue
+                for (_, future, _), result in zip(items, results):
+                    future.set_result(result)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._requests += len(batch)
+                self._last_batch_size = len(batch)
+                self._max_seen_batch_size = max(self._max_seen_batch_size, len(batch))
+                self._expired += expired
+
+    def profile_threads(self):
+        """Threads a request profile should sample besides the request's own: the batching worker"""
+        return {self._worker.ident: 'batch-inference'}
+
+    def stats(self):
+        """Return queue depth and achieved batch sizes for tuning the batching window"""
+        with self._stats_lock:
+            avg_batch_size = self._requests / self._batches if self._batches else 0
+            return {
+                'mode': 'batch',
+                'queue_depth': self._queue.qsize(),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait_ms,
+                'batches': self._batches,
+                'requests': self._requests,
+                'avg_batch_size': round(avg_batch_size, 2),
+                'last_batch_size': self._last_batch_size,
+                'largest_batch_size': self._max_seen_batch_size,
+                'expired': self._expired
+            }
+
+    def stop(self):
+        """Refuse new requests; the worker exits once everything already queued has been answered"""
+        self._stopped = True
+        self._queue.put(_STOP)
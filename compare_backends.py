@@ -0,0 +1,200 @@
+"""Compare detections and speed of two inference backends on a folder of test images
+
+    python compare_backends.py --images ImagesForTest --reference pytorch --candidate onnx
+
+Prints per-image agreement (per-class counts, weed density, matched box IoU) and the
+mean latency / speedup, optionally the memory footprint of each backend (--memory),
+and can write the full report as JSON.
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from model_loader import load_model, resolve_weights
+from postprocess import detections_array, summarize_detections
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def collect_images(folder):
+    paths = glob.glob(os.path.join(folder, '**', '*'), recursive=True)
+    return sorted(p for p in paths if p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def run_model(model, images, repeats=3):
+    """Return per-image detection arrays and mean latency in ms (after one untimed warm-up pass)"""
+    for path in images:
+        model(path)
+
+    detections = []
+    latencies = []
+    for path in images:
+        start = time.perf_counter()
+        for _ in range(repeats):
+            results = model(path)
+        latencies.append((time.perf_counter() - start) * 1000 / repeats)
+        detections.append(detections_array(results))
+    return detections, latencies
+
+
+def _memory_worker(conn, weights, yolov5_dir, backend, images):
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        conn.send(None)
+        return
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    model, _ = load_model(weights, yolov5_dir, warmup_runs=0, backend=backend)
+    for path in images:
+        model(path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((baseline, peak))
+
+
+def memory_footprint(backend, images, weights='best.pt', yolov5_dir='yolov5'):
+    """Weights file size and peak RSS of a fresh process that loads the backend and runs the images"""
+    path = resolve_weights(weights, backend)
+    memory = {'weights_mb': round(os.path.getsize(path) / 1024 ** 2, 2) if os.path.exists(path) else None}
+
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=_memory_worker, args=(child_conn, weights, yolov5_dir, backend, images))
+    process.start()
+    result = parent_conn.recv() if parent_conn.poll(600) else None
+    process.join()
+    if result is not None:
+        baseline, peak = result  # ru_maxrss is in KiB on Linux
+        memory['peak_rss_mb'] = round(peak / 1024, 1)
+        memory['model_rss_mb'] = round((peak - baseline) / 1024, 1)
+    return memory
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (n, 4) and (m, 4) xyxy boxes"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """Greedy same-class matching; returns the IoUs of matched pairs"""
+    ious = box_iou(reference[:, :4], candidate[:, :4])
+    ious[reference[:, 5][:, None] != candidate[:, 5][None, :]] = 0
+    matched = []
+    while ious.size and ious.max() >= iou_threshold:
+        i, j = np.unravel_index(np.argmax(ious), ious.shape)
+        matched.append(float(ious[i, j]))
+        ious[i, :] = 0
+        ious[:, j] = 0
+    return matched
+
+
+def compare(reference_dets, candidate_dets, images, iou_threshold=0.5):
+    per_image = []
+    all_ious = []
+    total_ref = total_cand = 0
+    for path, ref, cand in zip(images, reference_dets, candidate_dets):
+        _, ref_stats = summarize_detections(ref)
+        _, cand_stats = summarize_detections(cand)
+        ious = match_detections(ref, cand, iou_threshold)
+        all_ious.extend(ious)
+        total_ref += len(ref)
+        total_cand += len(cand)
+        per_image.append({
+            'image': path,
+            'reference_counts': {'weed': ref_stats['weed_count'], 'paddy': ref_stats['paddy_count']},
+            'candidate_counts': {'weed': cand_stats['weed_count'], 'paddy': cand_stats['paddy_count']},
+            'weed_density_diff': round(cand_stats['weed_density'] - ref_stats['weed_density'], 2),
+            'matched': len(ious),
+            'mean_iou': round(float(np.mean(ious)), 4) if ious else 0
+        })
+    return {
+        'images': per_image,
+        'matched_boxes': len(all_ious),
+        'recall_vs_reference': round(len(all_ious) / total_ref, 4) if total_ref else 1.0,
+        'precision_vs_reference': round(len(all_ious) / total_cand, 4) if total_cand else 1.0,
+        'mean_iou': round(float(np.mean(all_ious)), 4) if all_ious else 0
+    }
+
+
+def print_report(report):
+    print(f"\n{report['reference']} vs {report['candidate']} on {len(report['images'])} images")
+    print("-" * 100)
+    print("Image                          | Ref W/P   | Cand W/P  | Density diff | Matched | Mean IoU")
+    print("-" * 100)
+    for row in report['images']:
+        ref, cand = row['reference_counts'], row['candidate_counts']
+        print(f"{os.path.basename(row['image'])[:30]:<30} | {ref['weed']:4d}/{ref['paddy']:<4d} | "
+              f"{cand['weed']:4d}/{cand['paddy']:<4d} | {row['weed_density_diff']:+11.2f}% | "
+              f"{row['matched']:7d} | {row['mean_iou']:.4f}")
+    print("-" * 100)
+    print(f"Recall vs reference: {report['recall_vs_reference']:.4f} | "
+          f"Precision vs reference: {report['precision_vs_reference']:.4f} | Mean IoU: {report['mean_iou']:.4f}")
+    print(f"Latency: {report['reference_latency_ms']:.2f} ms -> {report['candidate_latency_ms']:.2f} ms "
+          f"(speedup x{report['speedup']:.2f})")
+    if 'memory' in report:
+        for name in ('reference', 'candidate'):
+            memory = report['memory'][name]
+            print(f"Memory ({report[name]}): weights {memory.get('weights_mb')} MB | "
+                  f"peak RSS {memory.get('peak_rss_mb')} MB | model + inference {memory.get('model_rss_mb')} MB")
+
+
+def run_comparison(images, reference='pytorch', candidate='onnx', weights='best.pt', yolov5_dir='yolov5',
+                   repeats=3, iou_threshold=0.5, measure_memory=False):
+    ref_model, _ = load_model(weights, yolov5_dir, warmup_runs=0, backend=reference)
+    cand_model, _ = load_model(weights, yolov5_dir, warmup_runs=0, backend=candidate)
+
+    ref_dets, ref_latency = run_model(ref_model, images, repeats)
+    cand_dets, cand_latency = run_model(cand_model, images, repeats)
+
+    report = compare(ref_dets, cand_dets, images, iou_threshold)
+    report.update({
+        'reference': reference,
+        'candidate': candidate,
+        'reference_latency_ms': round(float(np.mean(ref_latency)), 2),
+        'candidate_latency_ms': round(float(np.mean(cand_latency)), 2)
+    })
+    report['speedup'] = round(report['reference_latency_ms'] / report['candidate_latency_ms'], 3)
+    if measure_memory:
+        # Fresh processes so one backend's allocations do not hide the other's
+        report['memory'] = {
+            'reference': memory_footprint(reference, images, weights, yolov5_dir),
+            'candidate': memory_footprint(candidate, images, weights, yolov5_dir)
+        }
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check detection parity and speed between inference backends')
+    parser.add_argument('--images', default='ImagesForTest')
+    parser.add_argument('--weights', default='best.pt')
+    parser.add_argument('--yolov5-dir', default='yolov5')
+    parser.add_argument('--reference', default='pytorch')
+    parser.add_argument('--candidate', default='onnx')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU needed to count two boxes as the same detection')
+    parser.add_argument('--memory', action='store_true', help='also measure weights size and peak RSS per backend')
+    parser.add_argument('--output', help='write the full report to this JSON file')
+    args = parser.parse_args()
+
+    images = collect_images(args.images)
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+
+    report = run_comparison(images, args.reference, args.candidate, args.weights, args.yolov5_dir,
+                            args.repeats, args.iou, args.memory)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
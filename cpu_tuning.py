@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import torch
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+# CPUs the process may use (a container or taskset may allow fewer than os.cpu_count())
+ALLOWED_CPUS = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else None
+
+
+def current_settings():
+    """Thread and affinity settings the process is running with now"""
+    affinity = sorted(os.sched_getaffinity(0)) if ALLOWED_CPUS is not None else None
+    return {
+        'torch_threads': torch.get_num_threads(),
+        'torch_interop_threads': torch.get_num_interop_threads(),
+        'cv2_threads': cv2.getNumThreads(),
+        'cpus': affinity,
+        'cpu_count': os.cpu_count()
+    }
+
+
+def candidate_settings(cpus=None):
+    """Thread/affinity combinations worth measuring on this machine
+
+    torch intra-op threads from all cores down to one, OpenCV's pool either
+    sharing all cores or limited to one thread, and (where affinity is
+    supported) the process pinned to as many cores as torch has threads, which
+    keeps its threads off SMT siblings and other sockets.
+    """
+    cpus = cpus or ALLOWED_CPUS or list(range(os.cpu_count() or 1))
+    cpu_count = len(cpus)
+    threads = sorted({cpu_count, max(1, cpu_count * 3 // 4), max(1, cpu_count // 2), max(1, cpu_count // 4), 1},
+                     reverse=True)
+    pinning = ALLOWED_CPUS is not None and cpu_count > 1
+
+    candidates = []
+    for torch_threads in threads:
+        for cv2_threads in (None, 1):  # None: OpenCV's default pool, 1: OpenCV runs on the calling thread
+            candidates.append({'torch_threads': torch_threads, 'cv2_threads': cv2_threads, 'cpus': None})
+        if pinning and torch_threads < cpu_count:
+            candidates.append({'torch_threads': torch_threads, 'cv2_threads': None, 'cpus': cpus[:torch_threads]})
+    return candidates
+
+
+def _set_affinity(cpus):
+    # sched_setaffinity(0) only moves the calling thread; move every existing thread of the process
+    cpus = set(cpus)
+    try:
+        thread_ids = [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        thread_ids = [0]
+    for tid in thread_ids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            pass  # Thread exited meanwhile
+
+
+def apply_settings(setting):
+    """Apply a setting to torch, OpenCV and the process affinity; returns what is now in effect
+
+    Inter-op threads are left alone: torch only accepts that setting before its
+    first parallel work, and YOLOv5 inference runs on the intra-op pool.
+    """
+    torch.set_num_threads(setting['torch_threads'])
+    # A negative count restores OpenCV's default pool (0 would make it run sequentially)
+    cv2.setNumThreads(-1 if setting['cv2_threads'] is None else setting['cv2_threads'])
+    if ALLOWED_CPUS is not None:
+        _set_affinity(setting['cpus'] or ALLOWED_CPUS)
+    return current_settings()
+
+
+def load_calibration_frames(folder='ImagesForTest', limit=8, size=(640, 480)):
+    """RGB test images from `folder`, or synthetic frames when there are none"""
+    frames = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if len(frames) >= limit:
+                break
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image = cv2.imread(os.path.join(root, name))
+                if image is not None:
+                    frames.append(np.ascontiguousarray(image[..., ::-1]))
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(limit)]
+    return frames
+
+
+def _opencv_load(frame, stop):
+    # Stand-in for the annotation renderer: draw and encode continuously while the model runs
+    bgr = np.ascontiguousarray(frame[..., ::-1])
+    while not stop.is_set():
+        canvas = bgr.copy()
+        cv2.rectangle(canvas, (10, 10), (200, 200), (0, 0, 255), 2)
+        cv2.imencode('.jpg', canvas)
+
+
+def measure(model, frames, setting, size=640, runs=6, batch_size=4, contention=True):
+    """Apply `setting` and time the model: single-frame latency and batched throughput"""
+    apply_settings(setting)
+    model(frames[0], size=size)  # Let the new thread pool spin up before timing
+
+    stop = threading.Event()
+    worker = threading.Thread(target=_opencv_load, args=(frames[0], stop), daemon=True) if contention else None
+    if worker is not None:
+        worker.start()
+    try:
+        latencies = []
+        for i in range(runs):
+            start = time.perf_counter()
+            model(frames[i % len(frames)], size=size)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        batch = [frames[i % len(frames)] for i in range(batch_size)]
+        start = time.perf_counter()
+        model(batch, size=size)
+        throughput = batch_size / (time.perf_counter() - start)
+    finally:
+        stop.set()
+        if worker is not None:
+            worker.join()
+
+    return {
+        **setting,
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p90_ms': round(float(np.percentile(latencies, 90)), 2),
+        'throughput_fps': round(throughput, 2)
+    }
+
+
+def autotune(model, frames, size=640, objective='latency', runs=6, batch_size=4, candidates=None):
+    """Benchmark every candidate setting, apply the best and return a report
+
+    `objective='latency'` picks the lowest median single-frame latency (live
+    frames); `'throughput'` the most frames per second in batches (uploads).
+    Measured with OpenCV drawing and encoding in a parallel thread, like the
+    annotation renderer does under load.
+    """
+    start = time.perf_counter()
+    original = current_settings()
+    results = []
+    for setting in candidates or candidate_settings():
+        try:
+            results.append(measure(model, frames, setting, size, runs, batch_size))
+        except Exception as e:
+            results.append({**setting, 'error': str(e)})
+
+    measured = [result for result in results if 'error' not in result]
+    if not measured:
+        apply_settings({'torch_threads': original['torch_threads'], 'cv2_threads': original['cv2_threads'],
+                        'cpus': original['cpus']})
+        raise RuntimeError('No CPU setting could be measured')
+    if objective == 'throughput':
+        best = max(measured, key=lambda result: result['throughput_fps'])
+    else:
+        best = min(measured, key=lambda result: result['p50_ms'])
+
+    best_setting = {key: best[key] for key in ('torch_threads', 'cv2_threads', 'cpus')}
+    return {
+        'objective': objective,
+        'best': best_setting,
+        'best_result': best,
+        'default': {key: original[key] for key in ('torch_threads', 'cv2_threads', 'cpus')},
+        'applied': apply_settings(best_setting),
+        'results': results,
+        'calibration_seconds': round(time.perf_counter() - start, 2)
+    }
+
+
+def load_cached_tuning(path, key):
+    """A previous autotune report for the same machine and model, or None"""
+    try:
+        with open(path) as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return report if report.get('key') == key else None
+
+
+def save_tuning(path, key, report):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({**report, 'key': key}, f, indent=2)
@@ -0,0 +1,39 @@
+"""Export best.pt to an ONNX graph for the ONNX Runtime backend
+
+    python export_onnx.py --weights best.pt
+
+Writes best.onnx next to the weights. Select it at startup with MODEL_BACKEND = 'onnx'.
+"""
+import argparse
+import sys
+
+from model_loader import find_local_yolov5, resolve_weights
+
+
+def export_onnx(weights='best.pt', yolov5_dir='yolov5', imgsz=640, dynamic=True, opset=12, simplify=False):
+    """Run YOLOv5's own exporter from the local checkout and return the .onnx path"""
+    repo = find_local_yolov5(yolov5_dir)
+    if repo is None:
+        raise SystemExit('No local YOLOv5 checkout found. Clone it into yolov5/ first (see README).')
+
+    sys.path.insert(0, repo)
+    import export  # yolov5/export.py
+
+    # Dynamic axes keep the batch dimension free so micro-batching and tiling still work
+    export.run(weights=weights, imgsz=(imgsz, imgsz), include=('onnx',), device='cpu',
+               dynamic=dynamic, opset=opset, simplify=simplify)
+    return resolve_weights(weights, 'onnx')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the weed/paddy detector to ONNX')
+    parser.add_argument('--weights', default='best.pt')
+    parser.add_argument('--yolov5-dir', default='yolov5')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--opset', type=int, default=12)
+    parser.add_argument('--static', action='store_true', help='fixed batch size 1 instead of dynamic axes')
+    parser.add_argument('--simplify', action='store_true', help='run onnx-simplifier on the graph')
+    args = parser.parse_args()
+
+    path = export_onnx(args.weights, args.yolov5_dir, args.imgsz, not args.static, args.opset, args.simplify)
+    print(f"Exported {path}")
@@ -0,0 +1,339 @@
+import io
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from postprocess import WEED_CLASS, weed_density
+
+SURVEY_MODES = ('grid', 'geo')
+DEFAULT_CELL_SIZE = {'grid': 0.25, 'geo': 5.0}  # grid: in images (4 x 4 cells per image), geo: in metres
+DEFAULT_FOOTPRINT_M = 30.0  # Ground width covered by one image in geo mode
+MAX_GRID_CELLS = 4_000_000  # Per survey; two int32 layers, 32 MB
+METRES_PER_DEGREE_LAT = 110540.0
+METRES_PER_DEGREE_LON = 111320.0  # At the equator, scaled by cos(latitude)
+GPS_IFD = 0x8825
+# Grid-indexed file names such as r03_c12.jpg or row3-col12.png
+GRID_NAME = re.compile(r'(?:^|[^a-z])r(?:ow)?[_-]?(\d+)[_-]c(?:ol)?[_-]?(\d+)', re.IGNORECASE)
+
+
+def centers_from_det(det):
+    """Box centres (n, 2) in pixels and a weed mask from an (n, 6) detection array"""
+    det = np.asarray(det, dtype=np.float32).reshape(-1, 6)
+    centers = (det[:, :2] + det[:, 2:4]) / 2
+    return centers, det[:, 5].astype(np.int64) == WEED_CLASS
+
+
+def centers_from_results(results):
+    """Box centres and weed mask from the API output list (e.g. a cached /predict result)"""
+    centers = np.array([result['bbox'][:2] for result in results], dtype=np.float32).reshape(-1, 2)
+    return centers, np.array([result['class'] == 'Weed' for result in results], dtype=bool)
+
+
+def _exif_degrees(value, ref):
+    degrees, minutes, seconds = (float(part) for part in value)
+    sign = -1 if ref in ('S', 'W') else 1
+    return sign * (degrees + minutes / 60 + seconds / 3600)
+
+
+def image_info(image_bytes):
+    """(width, height, exif) from the image header alone; exif holds lat/lon/heading when geotagged"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+        try:
+            gps = image.getexif().get_ifd(GPS_IFD)
+        except Exception:
+            gps = {}
+    exif = {}
+    try:
+        if gps.get(2) and gps.get(4):
+            exif['lat'] = _exif_degrees(gps[2], gps.get(1))
+            exif['lon'] = _exif_degrees(gps[4], gps.get(3))
+            if gps.get(17) is not None:
+                exif['heading'] = float(gps[17])  # GPSImgDirection
+    except (TypeError, ValueError, ZeroDivisionError):
+        exif = {}
+    return width, height, exif
+
+
+def _float(values, name, default=None):
+    value = values.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number') from None
+    if not math.isfinite(value):
+        raise ValueError(f'{name} must be a number')
+    return value
+
+
+class FieldMap:
+    """Survey session: detection centres binned into a growing grid of per-cell weed/paddy counts
+
+    In 'grid' mode each image covers one unit square at (col, row) of the field and
+    `cell_size` is a fraction of an image. In 'geo' mode images are placed by the
+    latitude/longitude of their centre (request values or EXIF GPS) and their ground
+    width `footprint_m`, in metres east/south of the first image; `cell_size` is in
+    metres. Each image adds its detections with one vectorized update, so the
+    heatmap is always current without revisiting earlier images.
+    """
+
+    def __init__(self, name=None, mode='grid', cell_size=None, footprint_m=None):
+        if mode not in SURVEY_MODES:
+            raise ValueError(f"mode must be one of {', '.join(SURVEY_MODES)}")
+        cell_size = DEFAULT_CELL_SIZE[mode] if cell_size is None else cell_size
+        footprint_m = DEFAULT_FOOTPRINT_M if footprint_m is None else footprint_m
+        if cell_size <= 0 or footprint_m <= 0:
+            raise ValueError('cell_size and footprint_m must be positive')
+
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name or self.id
+        self.mode = mode
+        self.cell_size = cell_size
+        self.footprint_m = footprint_m
+        self.created = time.time()
+        self.updated = self.created
+
+        self._counts = np.zeros((2, 0, 0), dtype=np.int32)  # [weed, paddy] x rows x cols
+        self._origin = np.zeros(2, dtype=np.int64)  # Cell (x, y) index of _counts[:, 0, 0]
+        self._seen = None  # (x_min, y_min, x_max, y_max) cell indices that hold detections
+        self._geo_origin = None  # (lat, lon) of the first geo image
+        self._images = 0
+        self._lock = threading.Lock()
+
+    def placement(self, values, image_bytes, filename=None):
+        """Pixel-to-field transform for one image; raises ValueError when it cannot be placed
+
+        grid: `row`/`col` values, or a file name like r3_c12.jpg. geo: `lat`/`lon`
+        values or EXIF GPS, optional `footprint_m` and `heading` (degrees clockwise
+        from north of the image's top edge, default EXIF direction or 0).
+        """
+        try:
+            width, height, exif = image_info(image_bytes)
+        except Exception:
+            raise ValueError('Could not read the image size') from None
+
+        if self.mode == 'grid':
+            row, col = _float(values, 'row'), _float(values, 'col')
+            if row is None or col is None:
+                match = GRID_NAME.search(os.path.basename(filename or ''))
+                if match is None:
+                    raise ValueError('Grid surveys need row and col (or a file name like r3_c12.jpg)')
+                row, col = float(match.group(1)), float(match.group(2))
+            offset = np.array([col, row])
+            pixel_origin = np.zeros(2)
+            matrix = np.diag([1 / width, 1 / height])
+        else:
+            lat, lon = _float(values, 'lat', exif.get('lat')), _float(values, 'lon', exif.get('lon'))
+            if lat is None or lon is None:
+                raise ValueError('Geo surveys need lat and lon (or EXIF GPS tags)')
+            footprint_m = _float(values, 'footprint_m', self.footprint_m)
+            if footprint_m <= 0:
+                raise ValueError('footprint_m must be positive')
+            heading = math.radians(_float(values, 'heading', exif.get('heading', 0.0)))
+            with self._lock:
+                if self._geo_origin is None:
+                    self._geo_origin = (lat, lon)
+                lat0, lon0 = self._geo_origin
+            # Equirectangular approximation: metres east and south of the first image
+            east = (lon - lon0) * METRES_PER_DEGREE_LON * math.cos(math.radians(lat0))
+            south = (lat0 - lat) * METRES_PER_DEGREE_LAT
+            offset = np.array([east, south])
+            pixel_origin = np.array([width / 2, height / 2])
+            cos, sin = math.cos(heading), math.sin(heading)
+            matrix = footprint_m / width * np.array([[cos, -sin], [sin, cos]])
+
+        placement = {'offset': offset, 'pixel_origin': pixel_origin, 'matrix': matrix, 'image_size': (width, height)}
+        corners = np.array([[0, 0], [width, 0], [0, height], [width, height]], dtype=np.float64)
+        with self._lock:
+            self._ensure(self._cells(self._to_field(corners, placement)))
+        return placement
+
+    @staticmethod
+    def _to_field(pixels, placement):
+        return placement['offset'] + (pixels - placement['pixel_origin']) @ placement['matrix'].T
+
+    def _cells(self, points):
+        return np.floor(points / self.cell_size).astype(np.int64)
+
+    def _ensure(self, cells):
+        # Caller holds the lock. Grow the grid to cover `cells`, with slack on the side that grew
+        # so a survey sweeping in one direction reallocates only a logarithmic number of times.
+        if not len(cells):
+            return
+        _, rows, cols = self._counts.shape
+        low = cells.min(axis=0)
+        high = cells.max(axis=0) + 1
+        current_low, current_high = self._origin, self._origin + (cols, rows)
+        if rows and cols and (low >= current_low).all() and (high <= current_high).all():
+            return
+
+        new_low = np.minimum(low, current_low) if rows and cols else low
+        new_high = np.maximum(high, current_high) if rows and cols else high
+        extent = new_high - new_low
+        if int(extent[0]) * int(extent[1]) > MAX_GRID_CELLS:
+            raise ValueError('Survey area too large for its cell size; use a larger cell_size')
+        slack = extent // 2
+        if rows and cols:
+            new_low = np.where(low < current_low, new_low - slack, new_low)
+            new_high = np.where(high > current_high, new_high + slack, new_high)
+            if int((new_high - new_low).prod()) > MAX_GRID_CELLS:
+                new_low, new_high = np.minimum(low, current_low), np.maximum(high, current_high)
+
+        new_cols, new_rows = (int(v) for v in new_high - new_low)
+        counts = np.zeros((2, new_rows, new_cols), dtype=np.int32)
+        if rows and cols:
+            x, y = (int(v) for v in current_low - new_low)
+            counts[:, y:y + rows, x:x + cols] = self._counts
+        self._counts = counts
+        self._origin = new_low
+
+    def add(self, centers, is_weed, placement):
+        """Bin one image's detection centres (pixels) into the grid; returns the survey stats"""
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        with self._lock:
+            if len(centers):
+                cells = self._cells(self._to_field(centers, placement))
+                self._ensure(cells)
+                x, y = (cells - self._origin).T
+                np.add.at(self._counts, (np.where(is_weed, 0, 1), y, x), 1)
+
+                low, high = cells.min(axis=0), cells.max(axis=0)
+                if self._seen is not None:
+                    low = np.minimum(low, self._seen[:2])
+                    high = np.maximum(high, self._seen[2:])
+                self._seen = np.concatenate([low, high])
+            self._images += 1
+            self.updated = time.time()
+            return self._stats()
+
+    def _window(self):
+        # Caller holds the lock: counts cropped to the cells that hold detections, and that window's first cell
+        if self._seen is None:
+            return np.zeros((2, 0, 0), dtype=np.int32), None
+        x0, y0 = self._seen[:2] - self._origin
+        x1, y1 = self._seen[2:] - self._origin + 1
+        return self._counts[:, y0:y1, x0:x1].copy(), self._seen[:2]
+
+    def _stats(self):
+        weed, paddy = (int(total) for total in self._counts.sum(axis=(1, 2)))
+        window_cells = 0 if self._seen is None else int((self._seen[2:] - self._seen[:2] + 1).prod())
+        return {
+            'id': self.id,
+            'name': self.name,
+            'mode': self.mode,
+            'cell_size': self.cell_size,
+            'units': 'image' if self.mode == 'grid' else 'm',
+            'images': self._images,
+            'weed_count': weed,
+            'paddy_count': paddy,
+            'weed_density': weed_density(weed, paddy),
+            'grid_cells': window_cells,
+            'created': datetime.fromtimestamp(self.created).isoformat(timespec='seconds'),
+            'updated': datetime.fromtimestamp(self.updated).isoformat(timespec='seconds')
+        }
+
+    def stats(self):
+        with self._lock:
+            return self._stats()
+
+    def heatmap(self, sparse=False):
+        """Per-cell weed/paddy counts and weed density (%) of the surveyed area, row 0 at the top (north)
+
+        `origin` is the field position of the top-left cell's corner (images for
+        grid surveys, metres east/south of `geo_origin` for geo surveys). With
+        `sparse=True` only occupied cells are listed.
+        """
+        with self._lock:
+            (weed, paddy), first_cell = self._window()
+            info = {**self._stats(), 'geo_origin': self._geo_origin}
+        plants = weed + paddy
+        density = np.round(np.divide(weed * 100.0, plants, out=np.zeros(plants.shape), where=plants > 0), 2)
+        heatmap = {
+            **info,
+            'origin': None if first_cell is None else (first_cell * self.cell_size).tolist(),
+            'shape': list(plants.shape)
+        }
+        if sparse:
+            rows, cols = np.nonzero(plants)
+            heatmap['cells'] = [
+                {'row': row, 'col': col, 'weed': w, 'paddy': p, 'density': d}
+                for row, col, w, p, d in zip(rows.tolist(), cols.tolist(), weed[rows, cols].tolist(),
+                                             paddy[rows, cols].tolist(), density[rows, cols].tolist())
+            ]
+        else:
+            heatmap['weed'] = weed.tolist()
+            heatmap['paddy'] = paddy.tolist()
+            heatmap['density'] = [[d if p else None for d, p in zip(density_row, plants_row)]
+                                  for density_row, plants_row in zip(density.tolist(), plants.tolist())]
+        return heatmap
+
+    def render_png(self, layer='density', max_side=1024, cell_px=None):
+        """PNG of one layer ('density', 'weed', 'paddy' or 'plants'), green (low) to red (high); None if empty
+
+        Cells without plants are light grey. Each cell is drawn as a square of
+        `cell_px` pixels (default: as large as fits in `max_side`, up to 32).
+        """
+        with self._lock:
+            (weed, paddy), _ = self._window()
+        plants = weed + paddy
+        if not plants.size:
+            return None
+        if layer == 'density':
+            value = np.divide(weed, plants, out=np.zeros(plants.shape), where=plants > 0)
+        else:
+            counts = {'weed': weed, 'paddy': paddy, 'plants': plants}[layer]
+            value = counts / max(int(counts.max()), 1)
+
+        image = np.full(plants.shape + (3,), 230, dtype=np.uint8)
+        occupied = plants > 0
+        image[occupied] = np.stack([
+            np.zeros_like(value),
+            np.clip(2 * (1 - value), 0, 1) * 255,  # Green fades out above 50 %
+            np.clip(2 * value, 0, 1) * 255  # Red fades in below 50 %
+        ], axis=-1)[occupied].astype(np.uint8)
+
+        rows, cols = plants.shape
+        scale = cell_px or max(1, min(32, max_side // max(rows, cols)))
+        image = cv2.resize(image, (cols * scale, rows * scale), interpolation=cv2.INTER_NEAREST)
+        ok, buffer = cv2.imencode('.png', image)
+        return buffer.tobytes() if ok else None
+
+
+class SurveySessions:
+    """Registry of open survey sessions"""
+
+    def __init__(self, max_surveys=64):
+        self.max_surveys = max_surveys
+        self._surveys = {}
+        self._lock = threading.Lock()
+
+    def create(self, **options):
+        survey = FieldMap(**options)
+        with self._lock:
+            if len(self._surveys) >= self.max_surveys:
+                raise ValueError(f'At most {self.max_surveys} surveys can be open; delete one first')
+            self._surveys[survey.id] = survey
+        return survey
+
+    def get(self, survey_id):
+        with self._lock:
+            return self._surveys.get(survey_id)
+
+    def remove(self, survey_id):
+        with self._lock:
+            return self._surveys.pop(survey_id, None) is not None
+
+    def list(self):
+        with self._lock:
+            surveys = list(self._surveys.values())
+        return [survey.stats() for survey in surveys]
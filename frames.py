@@ -0,0 +1,38 @@
+import base64
+
+import cv2
+import numpy as np
+
+
+def decode_image_bytes(data):
+    """Decode JPEG/PNG bytes into a single BGR array without intermediate copies"""
+    # np.frombuffer wraps the request buffer as-is; imdecode allocates the only frame-sized array
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def read_frame_bytes(request):
+    """Return the encoded image bytes from a raw-bytes, multipart or legacy base64 JSON request, or None"""
+    mimetype = request.mimetype
+
+    if mimetype == 'application/octet-stream' or mimetype.startswith('image/'):
+        # Fast path: the body is the encoded image itself
+        data = request.get_data(cache=False)
+    elif mimetype == 'multipart/form-data':
+        file = request.files.get('image') or request.files.get('frame')
+        if file is None:
+            return None
+        data = file.read()
+    else:
+        # Backward compatible JSON body with a base64 data URL
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or not isinstance(payload.get('image'), str):
+            return None
+        encoded = payload['image'].split(',', 1)[-1]
+        try:
+            data = base64.b64decode(encoded)
+        except ValueError:
+            return None
+
+    return data or None
+
@@ -0,0 +1,60 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from postprocess import detections_array
+
+# Entry point of the worker_pool.InferencePool processes. The pool spawns them with this module standing in as
+# __main__, so a worker imports only this and the model loader instead of rerunning the web app's startup.
+
+
+def run(conn, shm_name, model_kwargs, torch_threads):
+    """Inference process: holds its own model copy and reads frames from shared memory"""
+    import cv2
+    import torch
+    from model_loader import load_model
+
+    # Split the cores between workers instead of every process grabbing all of them
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+    cv2.setNumThreads(1)
+
+    try:
+        model, startup = load_model(**model_kwargs)
+    except Exception as e:
+        conn.send(('error', str(e)))
+        return
+    slot = shared_memory.SharedMemory(name=shm_name)
+    conn.send(('ready', startup))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        kind, payload, size = message
+        extra = None
+        try:
+            if kind == 'path':
+                image = payload
+            else:
+                shape, dtype, name = payload
+                buffer = slot.buf
+                if name is not None:
+                    extra = shared_memory.SharedMemory(name=name)
+                    buffer = extra.buf
+                # Zero-copy view of the frame the web process wrote
+                image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=buffer)
+            results = model(image, size=size) if size else model(image)
+            conn.send(('ok', (detections_array(results), tuple(float(t) for t in results.t))))
+        except Exception as e:
+            conn.send(('error', str(e)))
+        finally:
+            image = None
+            if extra is not None:
+                extra.close()
+
+    slot.close()
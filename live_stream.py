@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class LatestFrame:
+    """Single-slot mailbox: a new frame replaces one that has not been picked up yet"""
+
+    def __init__(self):
+        self._frame = None
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, frame):
+        """Store the newest frame; returns True if it replaced (dropped) an unprocessed one"""
+        with self._cond:
+            dropped = self._frame is not None
+            self._frame = frame
+            self._cond.notify()
+            return dropped
+
+    def take(self):
+        """Wait for the newest frame; returns None once the slot is closed"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frame is not None or self._closed)
+            if self._closed:
+                return None
+            frame, self._frame = self._frame, None
+            return frame
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None}
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'p50': round(float(p50), 2), 'p95': round(float(p95), 2)}
+
+
+class LiveSession:
+    """Counters and recent timings for one live-stream client"""
+
+    def __init__(self, stream_id, window=60):
+        self.stream_id = stream_id
+        self.connected_at = time.time()
+        self.closed_at = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._sent_at = deque(maxlen=window)  # perf_counter() of the last results, for FPS
+        self._server_ms = deque(maxlen=window)  # Frame received -> results sent
+        self._client_ms = deque(maxlen=window)  # Frame captured -> results drawn, as reported by the client
+        self._lock = threading.Lock()
+
+    def frame_received(self, dropped):
+        with self._lock:
+            self.received += 1
+            self.dropped += dropped
+
+    def frame_processed(self, server_ms, error=False):
+        with self._lock:
+            self.processed += 1
+            self.errors += error
+            self._sent_at.append(time.perf_counter())
+            self._server_ms.append(server_ms)
+
+    def client_message(self, text):
+        """Handle a text message from the client; `{"type": "ack", "latency_ms": ...}` reports end-to-end latency"""
+        try:
+            message = json.loads(text)
+            latency_ms = float(message['latency_ms']) if message.get('type') == 'ack' else None
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return
+        if latency_ms is not None and latency_ms >= 0:
+            with self._lock:
+                self._client_ms.append(latency_ms)
+
+    def stats(self):
+        with self._lock:
+            sent_at = list(self._sent_at)
+            server_ms = list(self._server_ms)
+            client_ms = list(self._client_ms)
+            received, processed, dropped, errors = self.received, self.processed, self.dropped, self.errors
+        fps = (len(sent_at) - 1) / (sent_at[-1] - sent_at[0]) if len(sent_at) > 1 and sent_at[-1] > sent_at[0] else 0
+        return {
+            'stream_id': self.stream_id,
+            'connected_seconds': round((self.closed_at or time.time()) - self.connected_at, 1),
+            'frames_received': received,
+            'frames_processed': processed,
+            'frames_dropped': dropped,
+            'drop_ratio': round(dropped / received, 4) if received else 0,
+            'errors': errors,
+            'fps': round(fps, 2),
+            'server_latency_ms': _percentiles(server_ms),
+            'end_to_end_latency_ms': _percentiles(client_ms)
+        }
+
+
+class LiveSessions:
+    """Open live-stream sessions, plus the most recently closed ones for inspection"""
+
+    def __init__(self, keep_closed=20):
+        self._open = {}
+        self._closed = deque(maxlen=keep_closed)
+        self._lock = threading.Lock()
+
+    def open(self, stream_id):
+        session = LiveSession(stream_id)
+        with self._lock:
+            self._open[id(session)] = session
+        return session
+
+    def close(self, session):
+        session.closed_at = time.time()
+        with self._lock:
+            self._open.pop(id(session), None)
+            self._closed.append(session)
+
+    def stats(self):
+        with self._lock:
+            open_sessions, closed_sessions = list(self._open.values()), list(self._closed)
+        return {
+            'active_clients': len(open_sessions),
+            'clients': [session.stats() for session in open_sessions],
+            'recently_closed': [session.stats() for session in closed_sessions]
+        }
+
+
+def serve_live(ws, session, process):
+    """Run one WebSocket client until it disconnects
+
+    Binary messages are encoded frames. A reader thread keeps only the newest one,
+    so when inference falls behind the stale frames are dropped instead of queueing.
+    This thread runs `process(frame_bytes)` on each frame it picks up and pushes
+    `{"type": "detections", "seq": n, ...}` back, where n counts the binary messages
+    received (from 1); frames missing from the sequence were dropped. Text messages
+    are acks carrying the client's end-to-end latency.
+    """
+    slot = LatestFrame()
+
+    def read():
+        seq = 0
+        try:
+            while True:
+                message = ws.receive()
+                if isinstance(message, (bytes, bytearray)):
+                    seq += 1
+                    session.frame_received(slot.put((seq, time.perf_counter(), message)))
+                elif message is not None:
+                    session.client_message(message)
+        except Exception:
+            pass  # Connection closed by the client or the network
+        finally:
+            slot.close()
+
+    reader = threading.Thread(target=read, name=f'live-reader-{session.stream_id}', daemon=True)
+    reader.start()
+    try:
+        while True:
+            frame = slot.take()
+            if frame is None:
+                break
+            seq, received_at, frame_bytes = frame
+            try:
+                message = {'type': 'detections', 'seq': seq, **process(frame_bytes), 'status': 'success'}
+                error = False
+            except Exception as e:
+                message = {'type': 'error', 'seq': seq, 'error': str(e), 'status': 'error'}
+                error = True
+            session.frame_processed((time.perf_counter() - received_at) * 1000, error)
+            message['live'] = session.stats()
+            ws.send(json.dumps(message))
+    except Exception:
+        pass  # The client went away while results were being sent
+    finally:
+        slot.close()
@@ -0,0 +1,246 @@
+"""Load-test the Flask endpoints and report throughput and p50/p95/p99 latency
+
+    # Start app.py in-process with the CPU-only stand-in detector (no best.pt needed)
+    python loadtest.py --stand-in --concurrency 1,4,8 --duration 20 --output results.json
+
+    # Drive an already running server
+    python loadtest.py --url http://127.0.0.1:8800 --mix process-frame=8,predict=1,model-info=1
+
+    # Compare against an earlier run
+    python loadtest.py --stand-in --compare results.json
+
+Requests use the images in ImagesForTest/. /process-frame gets the raw JPEG bytes the
+video page sends; /predict gets a multipart upload made unique per request (bytes are
+appended after the image data) so the result cache does not hide inference cost,
+unless --allow-cache is given.
+"""
+import argparse
+import http.client
+import importlib
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+DEFAULT_MIX = 'process-frame=6,predict=3,model-info=1'
+
+
+def load_images(folder):
+    images = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(root, name), 'rb') as f:
+                    images.append((name, f.read()))
+    return images
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        endpoint, _, weight = part.partition('=')
+        mix[endpoint.strip()] = float(weight or 1)
+    unknown = set(mix) - {'process-frame', 'predict', 'model-info'}
+    if unknown:
+        raise SystemExit(f"Unknown endpoints in --mix: {sorted(unknown)}")
+    return mix
+
+
+def build_request(endpoint, images, rng, allow_cache):
+    """Return (method, path, body, headers) for one request"""
+    name, data = rng.choice(images)
+    if endpoint == 'model-info':
+        return 'GET', '/model-info', None, {}
+    if endpoint == 'process-frame':
+        return 'POST', '/process-frame', data, {'Content-Type': 'application/octet-stream'}
+
+    if not allow_cache:
+        # Trailing bytes after the image data change the content hash but not the decoded image
+        data = data + uuid.uuid4().bytes
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return 'POST', '/predict', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+def run_worker(host, port, deadline, max_requests, counter, mix, images, seed, allow_cache, samples):
+    rng = random.Random(seed)
+    endpoints, weights = list(mix), list(mix.values())
+    conn = http.client.HTTPConnection(host, port, timeout=120)
+    while time.perf_counter() < deadline:
+        with counter['lock']:
+            if max_requests and counter['sent'] >= max_requests:
+                break
+            counter['sent'] += 1
+        endpoint = rng.choices(endpoints, weights)[0]
+        method, path, body, headers = build_request(endpoint, images, rng, allow_cache)
+
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=120)
+            status = 0
+        samples.append((endpoint, (time.perf_counter() - start) * 1000, status, time.perf_counter()))
+    conn.close()
+
+
+def summarize(samples, elapsed):
+    def stats(rows):
+        latencies = np.array([row[1] for row in rows]) if rows else np.zeros(0)
+        ok = sum(1 for row in rows if 200 <= row[2] < 300)
+        return {
+            'requests': len(rows),
+            'errors': len(rows) - ok,
+            'throughput_rps': round(len(rows) / elapsed, 2) if elapsed else 0,
+            'mean_ms': round(float(latencies.mean()), 2) if len(rows) else None,
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2) if len(rows) else None,
+            'p95_ms': round(float(np.percentile(latencies, 95)), 2) if len(rows) else None,
+            'p99_ms': round(float(np.percentile(latencies, 99)), 2) if len(rows) else None,
+            'max_ms': round(float(latencies.max()), 2) if len(rows) else None,
+            'status_codes': {str(code): sum(1 for row in rows if row[2] == code) for code in sorted({row[2] for row in rows})}
+        }
+
+    endpoints = sorted({row[0] for row in samples})
+    return {
+        'overall': stats(samples),
+        'endpoints': {endpoint: stats([row for row in samples if row[0] == endpoint]) for endpoint in endpoints}
+    }
+
+
+def run_level(host, port, concurrency, duration, max_requests, mix, images, seed, allow_cache, warmup):
+    if warmup:
+        run_level(host, port, concurrency, warmup, 0, mix, images, seed + 1000, allow_cache, 0)
+
+    samples = []  # list.append is atomic, so workers share one list
+    counter = {'lock': threading.Lock(), 'sent': 0}
+    start = time.perf_counter()
+    deadline = start + duration if duration else float('inf')
+    threads = [
+        threading.Thread(target=run_worker, args=(host, port, deadline, max_requests, counter, mix, images,
+                                                  seed + i, allow_cache, samples), daemon=True)
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {'concurrency': concurrency, 'elapsed_seconds': round(elapsed, 3), **summarize(samples, elapsed)}
+
+
+def start_in_process(app_module, stand_in):
+    """Import the Flask app (optionally with the stand-in detector) and serve it on a free local port"""
+    from werkzeug.serving import make_server
+
+    if stand_in:
+        os.environ['MODEL_BACKEND'] = 'stand-in'
+    module = importlib.import_module(app_module)
+    server = make_server('127.0.0.1', 0, module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+    return server
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(report, baseline=None):
+    print(f"\nTarget: {report['target']} | mix: {report['mix']} | backend: {report['backend']}")
+    header = f"{'conc':>4} {'endpoint':<14} {'req':>6} {'err':>4} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    if baseline:
+        header += f" {'Δp95':>8} {'Δrps':>8}"
+    print(header)
+    print('-' * len(header))
+    previous = {level['concurrency']: level for level in (baseline or {}).get('levels', [])}
+    for level in report['levels']:
+        rows = [('overall', level['overall'])] + sorted(level['endpoints'].items())
+        for endpoint, stats in rows:
+            line = (f"{level['concurrency']:>4} {endpoint:<14} {stats['requests']:>6} {stats['errors']:>4} "
+                    f"{stats['throughput_rps']:>8.2f} {stats['p50_ms'] or 0:>9.1f} {stats['p95_ms'] or 0:>9.1f} "
+                    f"{stats['p99_ms'] or 0:>9.1f}")
+            old = previous.get(level['concurrency'], {})
+            old = old.get('overall') if endpoint == 'overall' else old.get('endpoints', {}).get(endpoint)
+            if baseline and old and old.get('p95_ms') and stats['p95_ms']:
+                line += (f" {(stats['p95_ms'] / old['p95_ms'] - 1) * 100:>+7.1f}%"
+                         f" {(stats['throughput_rps'] / old['throughput_rps'] - 1) * 100 if old['throughput_rps'] else 0:>+7.1f}%")
+            print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load-test /predict, /process-frame and /model-info')
+    parser.add_argument('--url', help='running server, e.g. http://127.0.0.1:8800 (default: start the app in-process)')
+    parser.add_argument('--app', default='app', help='app module to start in-process (app or app2)')
+    parser.add_argument('--stand-in', action='store_true', help='use the CPU-only stand-in detector instead of best.pt')
+    parser.add_argument('--images', default='ImagesForTest')
+    parser.add_argument('--concurrency', default='1,4', help='comma-separated client counts, one run each')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per concurrency level')
+    parser.add_argument('--requests', type=int, default=0, help='stop a level after this many requests instead')
+    parser.add_argument('--warmup', type=float, default=2, help='unmeasured seconds before each level')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint weights, e.g. process-frame=8,predict=1')
+    parser.add_argument('--allow-cache', action='store_true', help='let repeated /predict uploads hit the result cache')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--compare', help='earlier JSON results to diff p95 latency and throughput against')
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+    mix = parse_mix(args.mix)
+
+    server = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname, target.port or 80
+    else:
+        server = start_in_process(args.app, args.stand_in)
+        host, port = '127.0.0.1', server.port
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(',')]:
+        print(f"Running {concurrency} concurrent client(s)...")
+        levels.append(run_level(host, port, concurrency, None if args.requests else args.duration, args.requests,
+                                mix, images, args.seed, args.allow_cache, args.warmup))
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'target': args.url or f'in-process {args.app}',
+        'backend': 'stand-in' if args.stand_in else os.environ.get('MODEL_BACKEND', 'server default'),
+        'mix': args.mix,
+        'allow_cache': args.allow_cache,
+        'images': len(images),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpu_count': os.cpu_count()},
+        'levels': levels
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if server is not None:
+        server.shutdown()
@@ -0,0 +1,125 @@
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Numeric columns kept per request, in fixed-size arrays
+METRIC_COLUMNS = {
+    'timestamp': np.float64,
+    'iteration': np.int64,
+    'inference_time': np.float32,
+    'weed_count': np.int32,
+    'paddy_count': np.int32,
+    'total_objects': np.int32,
+    'weed_density': np.float32,
+    'avg_confidence': np.float32,
+    'success': np.bool_,
+    'kind': np.int8
+}
+# How a request got its detections; only 'inferred' rows ran the model and count towards latency
+RESULT_KINDS = ('inferred', 'skipped', 'tracked', 'cached')
+
+
+class MetricsHistory:
+    """Fixed-capacity ring buffer of per-request metrics with cheap rolling-window aggregates"""
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in METRIC_COLUMNS.items()}
+        self._notes = np.empty(capacity, dtype=object)  # filename / error text, None for most rows
+        self._next = 0
+        self._size = 0
+        self.total_recorded = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, metrics):
+        """Record one request from the same dict the routes already build"""
+        with self._lock:
+            i = self._next
+            cols = self._columns
+            cols['timestamp'][i] = time.time()
+            for name in ('iteration', 'inference_time', 'weed_count', 'paddy_count',
+                         'total_objects', 'weed_density', 'avg_confidence'):
+                cols[name][i] = metrics.get(name, 0)
+            cols['success'][i] = metrics.get('status') == 'success'
+            cols['kind'][i] = RESULT_KINDS.index(metrics.get('kind', 'inferred'))
+            self._notes[i] = metrics.get('error') or metrics.get('filename')
+
+            self._next = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+            self.total_recorded += 1
+
+    def _row(self, i):
+        cols = self._columns
+        row = {
+            'timestamp': datetime.fromtimestamp(cols['timestamp'][i]).strftime('%Y-%m-%d %H:%M:%S'),
+            'iteration': int(cols['iteration'][i]),
+            'inference_time': round(float(cols['inference_time'][i]), 6),
+            'weed_count': int(cols['weed_count'][i]),
+            'paddy_count': int(cols['paddy_count'][i]),
+            'total_objects': int(cols['total_objects'][i]),
+            'weed_density': round(float(cols['weed_density'][i]), 2),
+            'avg_confidence': round(float(cols['avg_confidence'][i]), 4),
+            'status': 'success' if cols['success'][i] else 'error',
+            'kind': RESULT_KINDS[cols['kind'][i]]
+        }
+        note = self._notes[i]
+        if note is not None:
+            row['filename' if row['status'] == 'success' else 'error'] = note
+        return row
+
+    def latest(self, n):
+        """Return the last n entries (oldest first) as dicts"""
+        with self._lock:
+            n = min(n, self._size)
+            indices = [(self._next - n + k) % self.capacity for k in range(n)]
+            return [self._row(i) for i in indices]
+
+    def _segments(self):
+        # Chronologically ordered views of the buffer (no copy): older part, then newer part
+        if self._size < self.capacity:
+            return [slice(0, self._size)]
+        return [slice(self._next, self.capacity), slice(0, self._next)]
+
+    def window(self, seconds, now=None):
+        """Aggregate the requests of the last `seconds` without copying the whole history"""
+        now = time.time() if now is None else now
+        since = now - seconds
+        with self._lock:
+            timestamps = self._columns['timestamp']
+            picked = []
+            for seg in self._segments():
+                # Each segment is sorted by time, so the window start is a binary search
+                start = seg.start + int(np.searchsorted(timestamps[seg], since, side='left'))
+                if start < seg.stop:
+                    picked.append(slice(start, seg.stop))
+            data = {
+                name: np.concatenate([self._columns[name][s] for s in picked]) if picked else np.empty(0)
+                for name in ('inference_time', 'weed_density', 'success', 'kind')
+            }
+
+        count = int(data['success'].size)
+        ok = data['success'].astype(bool)
+        inferred = ok & (data['kind'] == 0)
+        # Skipped, tracked and cached results did not run the model; their zero times would drag the percentiles down
+        latencies = data['inference_time'][inferred].astype(np.float64) * 1000
+        if latencies.size:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        else:
+            p50 = p95 = p99 = 0.0
+        return {
+            'window_seconds': seconds,
+            'requests': count,
+            'throughput_rps': round(count / seconds, 4) if seconds > 0 else 0,
+            'error_rate': round(1 - float(ok.mean()), 4) if count else 0,
+            'inferences': int(inferred.sum()),
+            'reused_results': int((ok & ~inferred).sum()),
+            'p50_latency_ms': round(float(p50), 2),
+            'p95_latency_ms': round(float(p95), 2),
+            'p99_latency_ms': round(float(p99), 2),
+            'mean_weed_density': round(float(data['weed_density'][ok].mean()), 2) if ok.any() else 0
+        }
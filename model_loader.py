@@ -0,0 +1,97 @@
+import os
+import time
+
+import numpy as np
+import torch
+
+
+def find_local_yolov5(yolov5_dir='yolov5'):
+    """Return a local YOLOv5 checkout (vendored dir first, then the torch.hub cache) or None"""
+    candidates = [yolov5_dir, os.path.join(torch.hub.get_dir(), 'ultralytics_yolov5_master')]
+    for path in candidates:
+        if path and os.path.isfile(os.path.join(path, 'hubconf.py')):
+            return os.path.abspath(path)
+    return None
+
+
+# Inference backends selectable at startup; all run behind YOLOv5's AutoShape so
+# letterbox, NMS, class filter and confidence threshold are identical
+BACKEND_SUFFIXES = {'pytorch': '.pt', 'onnx': '.onnx', 'onnx-int8': '.int8.onnx'}
+# No weights at all: a CPU-only substitute detector for load tests (see stand_in.py)
+STAND_IN_BACKEND = 'stand-in'
+
+
+def resolve_weights(weights, backend='pytorch'):
+    """Map the configured weights to the artifact for a backend (best.pt -> best.onnx / best.int8.onnx)"""
+    if backend == STAND_IN_BACKEND:
+        return weights
+    if backend not in BACKEND_SUFFIXES:
+        raise ValueError(f"Unknown inference backend '{backend}', "
+                         f"expected one of {sorted(BACKEND_SUFFIXES) + [STAND_IN_BACKEND]}")
+    # Longest suffix first so best.int8.onnx is not mistaken for best.int8 + .onnx
+    for suffix in sorted(BACKEND_SUFFIXES.values(), key=len, reverse=True):
+        if weights.endswith(suffix):
+            return weights[:-len(suffix)] + BACKEND_SUFFIXES[backend]
+    return weights
+
+
+def model_version(weights):
+    """Cheap identity of the weights file (name, size, mtime), used to key cached results"""
+    try:
+        stat = os.stat(weights)
+    except OSError:
+        return os.path.basename(weights)
+    return f"{os.path.basename(weights)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def warm_up(model, runs=1, size=640):
+    """Run dummy inferences so the first real request does not pay for lazy initialisation"""
+    dummy = np.zeros((size, size, 3), dtype=np.uint8)
+    for _ in range(runs):
+        model(dummy)
+
+
+def load_model(weights='best.pt', yolov5_dir='yolov5', conf=0.25, classes=(0, 1), warmup_runs=1, warmup_size=640,
+               backend='pytorch'):
+    """Load the detector exactly once, offline when a local YOLOv5 checkout is available
+
+    `weights` can be best.pt or any pre-exported artifact YOLOv5 understands
+    (e.g. .torchscript). `backend='onnx'` loads the matching .onnx file (see
+    export_onnx.py) and `backend='onnx-int8'` the quantized .int8.onnx file (see
+    quantize_int8.py), both run with ONNX Runtime. `backend='stand-in'` needs no
+    weights or YOLOv5 code. Returns (model, startup) where startup holds measured timings.
+    """
+    start = time.perf_counter()
+    weights = resolve_weights(weights, backend)
+
+    if backend == STAND_IN_BACKEND:
+        from stand_in import StandInDetector
+        model = StandInDetector(conf, classes, warmup_size)
+        repo = STAND_IN_BACKEND
+    else:
+        repo = find_local_yolov5(yolov5_dir)
+        if repo is not None:
+            model = torch.hub.load(repo, 'custom', path=weights, source='local')
+        else:
+            # No local checkout yet: fetch it once, later starts reuse the hub cache
+            model = torch.hub.load('ultralytics/yolov5', 'custom', path=weights)
+    model.conf = conf  # Confidence threshold
+    model.classes = list(classes)
+    load_seconds = time.perf_counter() - start
+
+    warmup_start = time.perf_counter()
+    if warmup_runs > 0:
+        warm_up(model, warmup_runs, warmup_size)
+    warmup_seconds = time.perf_counter() - warmup_start
+
+    startup = {
+        'weights': weights,
+        'backend': backend,
+        'model_version': model_version(weights) if backend != STAND_IN_BACKEND else STAND_IN_BACKEND,
+        'source': repo or 'github:ultralytics/yolov5',
+        'load_seconds': round(load_seconds, 3),
+        'warmup_runs': warmup_runs,
+        'warmup_seconds': round(warmup_seconds, 3),
+        'time_to_ready_seconds': round(time.perf_counter() - start, 3)
+    }
+    return model, startup
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+DEFAULT_MOTION_THRESHOLD = 4.0  # Mean absolute grey-level difference (0-255) on the thumbnail
+THUMBNAIL_WIDTH = 160  # Shared with tracking.gray_thumbnail, so /process-frame and /process-video see the same detail
+
+
+def frame_thumbnail(frame_bytes, width=THUMBNAIL_WIDTH):
+    """Small greyscale thumbnail straight from the encoded bytes
+
+    IMREAD_REDUCED_GRAYSCALE_4 lets the JPEG decoder skip most of the work, so a
+    frame that ends up skipped is never fully decoded. Frames too small for that
+    are decoded in full instead of being upscaled.
+    """
+    buffer = np.frombuffer(frame_bytes, dtype=np.uint8)
+    thumb = cv2.imdecode(buffer, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+    if thumb is not None and thumb.shape[1] < width:
+        thumb = cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+    if thumb is None:
+        return None
+    height = max(1, round(thumb.shape[0] * width / thumb.shape[1]))
+    return cv2.resize(thumb, (width, height), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+
+class _Stream:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.thumbnail = None  # Of the last frame the model actually ran on
+        self.payload = None  # (results, statistics) returned for that frame
+        self.frames = 0
+        self.skipped = 0
+        self.consecutive_skips = 0
+        self.last_diff = None
+        self.last_seen = time.time()
+
+
+class MotionGate:
+    """Per-stream frame skipping: reuse the last detections while the camera view barely changes
+
+    Each frame is compared with the last frame that was actually inferred (not the
+    previous frame), so a slow pan still builds up enough difference to trigger a
+    fresh inference. `max_skips` forces one after that many skips in a row.
+    """
+
+    def __init__(self, threshold=DEFAULT_MOTION_THRESHOLD, max_skips=30, max_streams=256, stream_ttl=300):
+        self.threshold = threshold
+        self.max_skips = max_skips
+        self.max_streams = max_streams
+        self.stream_ttl = stream_ttl
+
+        self._streams = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, stream_id):
+        # Caller holds the lock
+        now = time.time()
+        stream = self._streams.pop(stream_id, None) or _Stream(self.threshold)
+        stream.last_seen = now
+        self._streams[stream_id] = stream
+        # Forget streams that went quiet, and the least recently seen beyond the limit
+        for key, other in list(self._streams.items()):
+            if len(self._streams) <= self.max_streams and now - other.last_seen <= self.stream_ttl:
+                break
+            del self._streams[key]
+        return stream
+
+    def check(self, stream_id, thumbnail, threshold=None):
+        """Return the previous (results, statistics) if this frame can be skipped, else None"""
+        with self._lock:
+            stream = self._get(stream_id)
+            if threshold is not None:
+                stream.threshold = threshold
+            stream.frames += 1
+
+            if stream.thumbnail is None or thumbnail is None or stream.thumbnail.shape != thumbnail.shape:
+                stream.last_diff = None
+                return None
+            stream.last_diff = float(np.abs(thumbnail - stream.thumbnail).mean())
+            if stream.last_diff >= stream.threshold or stream.consecutive_skips >= self.max_skips:
+                return None
+
+            stream.skipped += 1
+            stream.consecutive_skips += 1
+            return stream.payload
+
+    def update(self, stream_id, thumbnail, results, statistics):
+        """Remember the frame the model just ran on and what it returned"""
+        with self._lock:
+            stream = self._get(stream_id)
+            stream.thumbnail = thumbnail
+            stream.payload = (results, statistics)
+            stream.consecutive_skips = 0
+
+    def stream_stats(self, stream_id):
+        with self._lock:
+            stream = self._streams.get(stream_id)
+            return self._describe(stream) if stream is not None else None
+
+    @staticmethod
+    def _describe(stream):
+        return {
+            'threshold': stream.threshold,
+            'frames': stream.frames,
+            'skipped': stream.skipped,
+            'skip_ratio': round(stream.skipped / stream.frames, 4) if stream.frames else 0,
+            'last_diff': round(stream.last_diff, 3) if stream.last_diff is not None else None
+        }
+
+    def stats(self):
+        with self._lock:
+            streams = {stream_id: self._describe(stream) for stream_id, stream in self._streams.items()}
+        frames = sum(s['frames'] for s in streams.values())
+        skipped = sum(s['skipped'] for s in streams.values())
+        return {
+            'default_threshold': self.threshold,
+            'max_skips': self.max_skips,
+            'active_streams': len(streams),
+            'skip_ratio': round(skipped / frames, 4) if frames else 0,
+            'streams': streams
+        }
@@ -0,0 +1,69 @@
+import cv2
+import numpy as np
+
+# Class ids used by best.pt (0: Weed, 1: Paddy)
+WEED_CLASS = 0
+PADDY_CLASS = 1
+CLASS_NAMES = np.array(['Weed', 'Paddy'])
+CLASS_COLORS = {WEED_CLASS: (0, 0, 255), PADDY_CLASS: (0, 255, 0)}  # BGR: red for weeds, green for paddy
+
+
+def detections_array(results, index=0):
+    """Return the (n, 6) [x1, y1, x2, y2, conf, class] array for one image of a YOLOv5 result"""
+    det = results.xyxy[index]
+    return det.cpu().numpy() if hasattr(det, 'cpu') else np.asarray(det)
+
+
+def weed_density(weed_count, paddy_count):
+    """Percentage of detected plants that are weeds"""
+    total_plants = weed_count + paddy_count
+    return round((weed_count / total_plants) * 100, 2) if total_plants > 0 else 0
+
+
+def summarize_detections(det):
+    """Build the API output list and statistics from a detection array in bulk"""
+    det = np.asarray(det, dtype=np.float32).reshape(-1, 6)
+
+    # Same integer pixel boxes the per-row loop used to produce
+    boxes = det[:, :4].astype(np.int64)
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    centers_x = np.round(boxes[:, 0] + widths / 2, 2)
+    centers_y = np.round(boxes[:, 1] + heights / 2, 2)
+
+    confidences = np.round(det[:, 4].astype(np.float64), 2)
+    class_ids = (det[:, 5].astype(np.int64) != WEED_CLASS).astype(np.int64)  # anything but Weed counts as Paddy
+    counts = np.bincount(class_ids, minlength=2)
+
+    weed_count = int(counts[WEED_CLASS])
+    paddy_count = int(counts[PADDY_CLASS])
+    total_plants = weed_count + paddy_count
+    avg_confidence = float(confidences.mean()) if total_plants > 0 else 0
+
+    output = [
+        {'class': name, 'confidence': conf, 'bbox': [cx, cy, w, h]}
+        for name, conf, cx, cy, w, h in zip(
+            CLASS_NAMES[class_ids].tolist(), confidences.tolist(),
+            centers_x.tolist(), centers_y.tolist(), widths.tolist(), heights.tolist()
+        )
+    ]
+
+    return output, {
+        'paddy_count': paddy_count,
+        'weed_count': weed_count,
+        'total_objects': total_plants,
+        'weed_density': weed_density(weed_count, paddy_count),
+        'avg_confidence': avg_confidence
+    }
+
+
+def render_detections(img, det):
+    """Draw bounding boxes and labels onto a BGR image in place"""
+    det = np.asarray(det).reshape(-1, 6)
+    boxes = det[:, :4].astype(np.int64).tolist()
+    class_ids = (det[:, 5].astype(np.int64) != WEED_CLASS).astype(np.int64).tolist()
+    for (x1, y1, x2, y2), conf, class_id in zip(boxes, det[:, 4].tolist(), class_ids):
+        color = CLASS_COLORS[class_id]
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(img, f"{CLASS_NAMES[class_id]}: {conf:.2f}", (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+    return img
@@ -0,0 +1,82 @@
+"""Measure per-request time and peak memory of the /predict image pipeline
+
+    python profile_predict.py --images "ImagesForTest/Weeds Images"            # stand-in detector (stand_in.py)
+    python profile_predict.py --images "ImagesForTest/Weeds Images" --model    # real best.pt
+
+Compares the old disk round-trip (write upload, model reads the file, cv2.imread
+for drawing) with the in-memory pipeline (decode once, same array for inference
+and drawing). Peak memory is tracemalloc's peak, which covers numpy/OpenCV arrays.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from compare_backends import collect_images
+from frames import decode_image_bytes
+from postprocess import detections_array, render_detections, summarize_detections
+from stand_in import StandInDetector
+
+
+def disk_pipeline(model, image_bytes, workdir):
+    path = os.path.join(workdir, 'upload.jpg')
+    with open(path, 'wb') as f:
+        f.write(image_bytes)
+    det = detections_array(model(path))
+    img = cv2.imread(path)
+    summarize_detections(det)
+    render_detections(img, det)
+    cv2.imwrite(os.path.join(workdir, 'predicted_upload.jpg'), img)
+
+
+def memory_pipeline(model, image_bytes, workdir):
+    img = decode_image_bytes(image_bytes)
+    det = detections_array(model(img[..., ::-1]))
+    summarize_detections(det)
+    render_detections(img, det)
+    cv2.imwrite(os.path.join(workdir, 'predicted_upload.jpg'), img)
+
+
+def measure(pipeline, model, uploads, workdir, repeats):
+    times = []
+    peaks = []
+    for image_bytes in uploads:
+        for _ in range(repeats):
+            tracemalloc.start()
+            start = time.perf_counter()
+            pipeline(model, image_bytes, workdir)
+            times.append((time.perf_counter() - start) * 1000)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024 ** 2)
+            tracemalloc.stop()
+    return {'mean_ms': round(float(np.mean(times)), 2), 'p95_ms': round(float(np.percentile(times, 95)), 2),
+            'peak_mb': round(float(np.max(peaks)), 1)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Profile the /predict pipeline before and after single decode')
+    parser.add_argument('--images', default=os.path.join('ImagesForTest', 'Weeds Images'))
+    parser.add_argument('--model', action='store_true', help='use best.pt instead of the stand-in detector')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.model:
+        from model_loader import load_model
+        model, _ = load_model()
+    else:
+        model = StandInDetector()
+
+    uploads = []
+    for path in collect_images(args.images):
+        with open(path, 'rb') as f:
+            uploads.append(f.read())
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, pipeline in (('disk (before)', disk_pipeline), ('memory (after)', memory_pipeline)):
+            pipeline(model, uploads[0], workdir)  # Warm-up
+            result = measure(pipeline, model, uploads, workdir, args.repeats)
+            print(f"{name:<15} mean {result['mean_ms']:8.2f} ms | p95 {result['p95_ms']:8.2f} ms | "
+                  f"peak {result['peak_mb']:7.1f} MB")
@@ -0,0 +1,246 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def _frame_name(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    names.reverse()  # Outermost first
+    return tuple(names)
+
+
+class StackSampler:
+    """Sample the Python stacks of a few threads at a fixed interval from a background thread"""
+
+    def __init__(self, threads, interval=0.001):
+        self.threads = threads  # {thread ident: label}
+        self.interval = interval
+        self.samples = []  # (perf_counter, label, stack)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            for ident, label in self.threads.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples.append((now, label, _stack(frame)))
+
+
+def _sample_events(samples, origin, interval, pid):
+    """Turn stack samples into nested Chrome-trace complete events, one track per thread"""
+    events = []
+    open_frames = {}  # label -> [(name, start)]
+    last_ts = {}
+
+    def close(label, depth, end):
+        for name, start in open_frames[label][depth:]:
+            events.append({'name': name, 'cat': 'python', 'ph': 'X', 'pid': pid, 'tid': label,
+                           'ts': round((start - origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)})
+        del open_frames[label][depth:]
+
+    for ts, label, stack in samples:
+        current = open_frames.setdefault(label, [])
+        common = 0
+        while common < len(current) and common < len(stack) and current[common][0] == stack[common]:
+            common += 1
+        close(label, common, ts)
+        current.extend((name, ts) for name in stack[common:])
+        last_ts[label] = ts
+    for label in open_frames:
+        close(label, 0, last_ts[label] + interval)
+    return events
+
+
+class RequestProfile:
+    """Python stack samples and torch operator timings recorded for one request"""
+
+    def __init__(self, endpoint, threads, interval):
+        # Sorts by creation time, which pruning and listing rely on
+        self.id = datetime.now().strftime('%Y%m%d-%H%M%S-%f-') + uuid.uuid4().hex[:4]
+        self.endpoint = endpoint
+        self.created = time.time()
+        self.duration_ms = None
+        self._origin = time.perf_counter()
+        self._sampler = StackSampler(threads, interval)
+        self._torch_events = []
+        self._torch_ops = Counter()  # op name -> total self CPU time (us)
+        self._lock = threading.Lock()
+
+    def start(self):
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        self._sampler.stop()
+        self.duration_ms = round((time.perf_counter() - self._origin) * 1000, 2)
+
+    def add_torch_ops(self, events, started_at, thread_label):
+        """Record torch.profiler FunctionEvents captured from `started_at` (perf_counter) on one thread"""
+        events = [event for event in events if event.time_range.end > event.time_range.start]
+        if not events:
+            return
+        base = min(event.time_range.start for event in events)
+        offset = (started_at - self._origin) * 1e6
+        converted = [{
+            'name': event.name, 'cat': 'torch', 'ph': 'X', 'pid': os.getpid(), 'tid': f'{thread_label} (torch ops)',
+            'ts': round(offset + event.time_range.start - base, 1),
+            'dur': round(event.time_range.end - event.time_range.start, 1),
+            'args': {'input_shapes': str(event.input_shapes)} if getattr(event, 'input_shapes', None) else {}
+        } for event in events]
+        with self._lock:
+            self._torch_events.extend(converted)
+            for event in events:
+                self._torch_ops[event.name] += event.self_cpu_time_total
+
+    def chrome_trace(self):
+        """Chrome trace-event JSON (chrome://tracing, Perfetto, speedscope)"""
+        pid = os.getpid()
+        samples = self._sampler.samples
+        events = _sample_events(samples, self._origin, self._sampler.interval, pid)
+        with self._lock:
+            events.extend(dict(event) for event in self._torch_events)
+        # The trace format wants numeric thread ids; the labels become thread names
+        tids = {label: tid for tid, label in enumerate(sorted({event['tid'] for event in events}), 1)}
+        for event in events:
+            event['tid'] = tids[event['tid']]
+        events.extend({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': label}}
+                      for label, tid in tids.items())
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'endpoint': self.endpoint, 'profile_id': self.id}}
+
+    def folded_stacks(self):
+        """Collapsed stacks ("thread;outer;inner count") for flamegraph.pl and speedscope"""
+        counts = Counter(';'.join((label,) + stack) for _, label, stack in self._sampler.samples)
+        return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common())
+
+    def summary(self, top=15):
+        with self._lock:
+            top_ops = [{'op': name, 'self_cpu_ms': round(us / 1000, 3)} for name, us in self._torch_ops.most_common(top)]
+        return {
+            'id': self.id,
+            'endpoint': self.endpoint,
+            'created': datetime.fromtimestamp(self.created).isoformat(timespec='seconds'),
+            'duration_ms': self.duration_ms,
+            'stack_samples': len(self._sampler.samples),
+            'torch_ops': len(self._torch_events),
+            'top_torch_ops': top_ops
+        }
+
+
+@contextmanager
+def _torch_recording(profiles, thread_label):
+    try:
+        from torch.profiler import ProfilerActivity, profile
+    except ImportError:
+        yield
+        return
+    started_at = time.perf_counter()
+    with profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+        yield
+    events = prof.events()
+    for request_profile in profiles:
+        request_profile.add_torch_ops(events, started_at, thread_label)
+
+
+def record_torch_ops(profiles, thread_label='inference'):
+    """Context manager around a model call: torch operator timings go to every profile in `profiles`
+
+    With no profiles it is a no-op, so unprofiled batches pay nothing.
+    """
+    return _torch_recording(profiles, thread_label) if profiles else nullcontext()
+
+
+class RequestProfiler:
+    """Opt-in per-request profiling with traces kept on disk
+
+    A request is profiled when it sends `X-Profile: 1` (or `?profile=1`), or at
+    random with probability `sample_rate`. Only profiled requests start a stack
+    sampler or torch.profiler. The newest `max_profiles` traces are kept.
+    """
+
+    def __init__(self, directory, sample_rate=0.0, interval_ms=1.0, max_profiles=50):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def wanted(self, request):
+        flag = request.headers.get('X-Profile') or request.args.get('profile')
+        if flag is not None:
+            return flag.lower() in TRUE_VALUES
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def begin(self, endpoint, threads=None):
+        """Start profiling the calling thread (plus `threads`, {ident: label}) for one request"""
+        watched = {threading.get_ident(): 'request'}
+        watched.update(threads or {})
+        return RequestProfile(endpoint, watched, self.interval).start()
+
+    def end(self, profile):
+        """Stop sampling, write the trace files and return the profile summary"""
+        profile.stop()
+        summary = profile.summary()
+        summary['files'] = [f'{profile.id}.trace.json', f'{profile.id}.folded']
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, summary['files'][0]), 'w') as f:
+            json.dump(profile.chrome_trace(), f)
+        with open(os.path.join(self.directory, summary['files'][1]), 'w') as f:
+            f.write(profile.folded_stacks())
+        with open(os.path.join(self.directory, f'{profile.id}.json'), 'w') as f:
+            json.dump(summary, f)
+        self._prune()
+        return summary
+
+    def _prune(self):
+        with self._lock:
+            summaries = sorted(name for name in os.listdir(self.directory)
+                               if name.endswith('.json') and not name.endswith('.trace.json'))
+            for name in summaries[:-self.max_profiles] if len(summaries) > self.max_profiles else []:
+                profile_id = name[:-len('.json')]
+                for suffix in ('.json', '.trace.json', '.folded'):
+                    try:
+                        os.remove(os.path.join(self.directory, profile_id + suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self):
+        """Summaries of the stored profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith('.json') and not name.endswith('.trace.json'):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return profiles
@@ -0,0 +1,104 @@
+"""Post-training INT8 quantization of the weed/paddy detector with ONNX Runtime
+
+    python quantize_int8.py --calibration "ImagesForTest/Weeds Images"
+
+Exports best.onnx if needed, calibrates activation ranges on the images in the
+calibration folder, writes best.int8.onnx and prints an FP32-vs-INT8 report
+(latency, memory, per-class counts, weed density, box IoU). Select the result at
+startup with MODEL_BACKEND = 'onnx-int8'.
+"""
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+from compare_backends import collect_images, print_report, run_comparison
+from model_loader import resolve_weights
+
+
+def letterbox(image, size=640, color=(114, 114, 114)):
+    """Resize keeping the aspect ratio and pad to size x size, as YOLOv5's AutoShape does"""
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w, new_h = int(round(width * scale)), int(round(height * scale))
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, left = (size - new_h) // 2, (size - new_w) // 2
+    return cv2.copyMakeBorder(resized, top, size - new_h - top, left, size - new_w - left,
+                              cv2.BORDER_CONSTANT, value=color)
+
+
+def load_calibration_images(folder, size=640):
+    """Calibration tensors in the exported graph's layout: 1x3xHxW RGB float32 in [0, 1]"""
+    tensors = []
+    for path in collect_images(folder):
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        image = letterbox(image, size)[:, :, ::-1].transpose(2, 0, 1)
+        tensors.append(np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0)
+    return tensors
+
+
+def quantize(onnx_path, output_path, calibration_folder, size=640, per_channel=True):
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType,
+                                          quantize_static)
+    import onnxruntime
+
+    tensors = load_calibration_images(calibration_folder, size)
+    if not tensors:
+        raise SystemExit(f"No calibration images found in {calibration_folder}")
+    input_name = onnxruntime.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+
+    class ImageReader(CalibrationDataReader):
+        def __init__(self):
+            self._items = iter(tensors)
+
+        def get_next(self):
+            tensor = next(self._items, None)
+            return None if tensor is None else {input_name: tensor}
+
+    # Only Conv/MatMul weights and activations go to INT8; the Detect head's
+    # sigmoid/grid decode stays FP32 so box coordinates keep their precision
+    quantize_static(onnx_path, output_path, ImageReader(),
+                    quant_format=QuantFormat.QDQ,
+                    op_types_to_quantize=['Conv', 'MatMul'],
+                    per_channel=per_channel,
+                    activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8,
+                    calibrate_method=CalibrationMethod.MinMax)
+    return len(tensors)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Quantize the detector to INT8 and compare it against FP32')
+    parser.add_argument('--weights', default='best.pt')
+    parser.add_argument('--yolov5-dir', default='yolov5')
+    parser.add_argument('--calibration', default=os.path.join('ImagesForTest', 'Weeds Images'))
+    parser.add_argument('--images', help='evaluation images (defaults to the calibration folder)')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--per-tensor', action='store_true', help='per-tensor instead of per-channel weight scales')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--skip-report', action='store_true')
+    parser.add_argument('--output', help='write the comparison report to this JSON file')
+    args = parser.parse_args()
+
+    onnx_path = resolve_weights(args.weights, 'onnx')
+    int8_path = resolve_weights(args.weights, 'onnx-int8')
+    if not os.path.exists(onnx_path):
+        from export_onnx import export_onnx
+        export_onnx(args.weights, args.yolov5_dir, args.imgsz)
+
+    count = quantize(onnx_path, int8_path, args.calibration, args.imgsz, not args.per_tensor)
+    print(f"Calibrated on {count} images, wrote {int8_path}")
+
+    if not args.skip_report:
+        images = collect_images(args.images or args.calibration)
+        report = run_comparison(images, 'pytorch', 'onnx-int8', args.weights, args.yolov5_dir,
+                                args.repeats, measure_memory=True)
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Report written to {args.output}")
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from postprocess import render_detections
+
+
+class _RenderJob:
+    def __init__(self, source, det, image=None):
+        self.source = source  # Path of the original upload, read only when the decoded image is gone
+        self.det = det
+        self.image = image  # Decoded BGR upload, shared with inference so it is not decoded twice
+        self.lock = threading.Lock()
+        self.done = False
+
+
+class AnnotationRenderer:
+    """Draw annotated images off the request path: lazily on first fetch, or in a background thread
+
+    `max_side` downscales before drawing and `jpeg_quality` applies to .jpg/.webp
+    outputs, both to cut encode time and disk usage. Rendered files are left on
+    disk, so later fetches are plain static file reads. Decoded images held for
+    pending jobs are capped at `max_image_bytes`; past that the oldest jobs fall
+    back to re-reading their saved upload (or are dropped if there is none).
+    """
+
+    def __init__(self, output_dir, background=True, max_side=None, jpeg_quality=None, max_pending=256,
+                 max_image_bytes=256 * 1024 * 1024):
+        self.output_dir = output_dir
+        self.background = background
+        self.max_side = max_side
+        self.jpeg_quality = jpeg_quality
+        self.max_pending = max_pending
+        self.max_image_bytes = max_image_bytes
+
+        self._jobs = OrderedDict()  # output filename -> _RenderJob
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='annotate') if background else None
+        self._counters = {'scheduled': 0, 'rendered': 0, 'dropped': 0, 'failed': 0}
+        self._render_ms = 0.0
+        self._image_bytes = 0
+
+    def schedule(self, output_filename, source, det, image=None):
+        """Register detections for an annotated image; rendering starts now (background) or on first fetch (lazy)
+
+        `image` is the already decoded BGR upload, which the renderer then owns and draws on
+        in place; without it the image is read from `source`.
+        """
+        job = _RenderJob(source, det, image)
+        with self._lock:
+            self._discard(self._jobs.pop(output_filename, None))
+            self._jobs[output_filename] = job
+            self._image_bytes += image.nbytes if image is not None else 0
+            self._counters['scheduled'] += 1
+            while len(self._jobs) > self.max_pending:
+                self._discard(self._jobs.popitem(last=False)[1])
+                self._counters['dropped'] += 1
+            # Release the oldest in-memory images first, keeping jobs that can re-read their upload
+            for name, pending in list(self._jobs.items()):
+                if self._image_bytes <= self.max_image_bytes:
+                    break
+                if pending.image is None or pending is job:
+                    continue
+                self._image_bytes -= pending.image.nbytes
+                pending.image = None
+                if pending.source is None:
+                    del self._jobs[name]
+                    self._counters['dropped'] += 1
+        if self._executor is not None:
+            self._executor.submit(self.ensure, output_filename)
+
+    def _discard(self, job):
+        # Caller holds the lock
+        if job is not None and job.image is not None:
+            self._image_bytes -= job.image.nbytes
+            job.image = None
+
+    def available(self, output_filename):
+        """True when the annotated image is on disk or can still be rendered"""
+        with self._lock:
+            if output_filename in self._jobs:
+                return True
+        return os.path.exists(os.path.join(self.output_dir, output_filename))
+
+    def ensure(self, output_filename):
+        """Render the image if it is still pending and return its path (None if unknown or failed)"""
+        with self._lock:
+            job = self._jobs.get(output_filename)
+        path = os.path.join(self.output_dir, output_filename)
+        if job is None:
+            return path if os.path.exists(path) else None
+
+        with job.lock:
+            if not job.done:
+                try:
+                    self._render(job, path)
+                except Exception as e:
+                    print(f"Failed to render {output_filename}: {e}")
+                    with self._lock:
+                        self._counters['failed'] += 1
+                        self._finish(output_filename, job)
+                    return None
+                job.done = True
+        with self._lock:
+            self._finish(output_filename, job)
+        return path
+
+    def _finish(self, output_filename, job):
+        # Caller holds the lock
+        if self._jobs.get(output_filename) is job:
+            del self._jobs[output_filename]
+            self._discard(job)
+
+    def _render(self, job, path):
+        start = time.perf_counter()
+        img = job.image
+        if img is None:
+            img = cv2.imread(job.source) if job.source else None
+            if img is None:
+                raise ValueError(f'could not read {job.source}')
+        det = job.det
+        if self.max_side and max(img.shape[:2]) > self.max_side:
+            # Draw on the downscaled image with boxes scaled to match
+            scale = self.max_side / max(img.shape[:2])
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            det = det.copy()
+            det[:, :4] *= scale
+        render_detections(img, det)
+
+        params = []
+        ext = os.path.splitext(path)[1].lower()
+        if self.jpeg_quality is not None and ext in ('.jpg', '.jpeg'):
+            params = [cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)]
+        elif self.jpeg_quality is not None and ext == '.webp':
+            params = [cv2.IMWRITE_WEBP_QUALITY, int(self.jpeg_quality)]
+        ok, encoded = cv2.imencode(ext, img, params)
+        if not ok:
+            raise IOError(f'could not encode {path}')
+        # Atomic replace so a concurrent fetch never sees a half-written file
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._counters['rendered'] += 1
+            self._render_ms += (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        with self._lock:
+            return {
+                'mode': 'background' if self.background else 'lazy',
+                'pending': len(self._jobs),
+                'pending_image_bytes': self._image_bytes,
+                **self._counters,
+                'avg_render_ms': round(self._render_ms / self._counters['rendered'], 2) if self._counters['rendered'] else 0,
+                'max_side': self.max_side,
+                'jpeg_quality': self.jpeg_quality
+            }
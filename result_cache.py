@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def cache_key(image_bytes, settings):
+    """Content address for a result: hash of the image bytes plus the inference settings"""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier (in-memory LRU + optional on-disk) cache of detection results keyed by content hash"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, cache_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self._entries = OrderedDict()  # key -> (size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_evictions': 0}
+
+        # Running size of the disk tier: puts only rescan the directory when it is over budget
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_usage())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return entry[1]
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._store(key, value, len(json.dumps(value)))
+        return value
+
+    def put(self, key, value):
+        encoded = json.dumps(value)
+        with self._lock:
+            self._store(key, value, len(encoded))
+        self._write_disk(key, encoded)
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[0]
+        if self.cache_dir:
+            path = self._disk_path(key)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            with self._disk_lock:
+                self._disk_bytes -= size
+
+    def _store(self, key, value, size):
+        # Caller holds the lock
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[0]
+        self._entries[key] = (size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._counters['evictions'] += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r') as f:
+                value = json.load(f)
+            os.utime(path)  # Refresh recency for disk eviction
+        except (OSError, ValueError):
+            return None
+        return value
+
+    def _write_disk(self, key, encoded):
+        # Best effort: a failed disk write only means the result is not persisted
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = None
+        try:
+            # A unique temporary name, so concurrent writes of the same key cannot clash
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=key[:16], suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(encoded)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except OSError:
+            return
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        with self._disk_lock:
+            self._disk_bytes += len(encoded.encode('utf-8')) - replaced
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _disk_usage(self):
+        files = []
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return files
+        for entry in entries:
+            if entry.name.endswith('.json'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Evicted meanwhile
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict_disk(self):
+        # Only one eviction pass at a time; it also resyncs the running total with the directory
+        with self._disk_lock:
+            files = self._disk_usage()
+            total = sum(size for _, size, _ in files)
+            # Least recently used files go first
+            for _, size, path in sorted(files):
+                if total <= self.max_disk_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                with self._lock:
+                    self._counters['disk_evictions'] += 1
+            self._disk_bytes = total
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._entries)
+            memory_bytes = self._bytes
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        hits = counters['memory_hits'] + counters['disk_hits']
+        stats = {
+            **counters,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0,
+            'entries': entries,
+            'memory_bytes': memory_bytes,
+            'max_bytes': self.max_bytes
+        }
+        if self.cache_dir:
+            with self._disk_lock:
+                stats['disk_bytes'] = self._disk_bytes
+            stats['max_disk_bytes'] = self.max_disk_bytes
+        return stats
@@ -0,0 +1,83 @@
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class StandInDetections:
+    """Just enough of YOLOv5's Detections (xyxy, t, tolist) for the app's code paths"""
+
+    def __init__(self, xyxy, times):
+        self.xyxy = xyxy
+        self.t = times
+        self.n = len(xyxy)
+
+    def tolist(self):
+        return [StandInDetections([det], self.t) for det in self.xyxy]
+
+
+class StandInDetector:
+    """CPU-only substitute for the Weed/Paddy model, for load tests and demos without best.pt
+
+    Letterbox-resizes each image to the inference size like AutoShape and does a
+    comparable amount of per-pixel work, then boxes connected regions of vegetation
+    (excess-green mask). Small regions are labelled Weed, large ones Paddy. The
+    boxes are plausible and deterministic, not accurate.
+    """
+
+    def __init__(self, conf=0.25, classes=(0, 1), size=640):
+        self.conf = conf
+        self.classes = list(classes) if classes is not None else None
+        self.size = size
+
+    @staticmethod
+    def _load(image):
+        if isinstance(image, str):
+            return np.asarray(Image.open(image).convert('RGB'))
+        return np.ascontiguousarray(image)  # AutoShape makes the same contiguous copy of strided views
+
+    def _detect(self, image, size):
+        height, width = image.shape[:2]
+        scale = size / max(height, width)
+        small = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        # Excess-green index (2G - R - B) on RGB input
+        rgb = small.astype(np.int16)
+        mask = ((2 * rgb[..., 1] - rgb[..., 0] - rgb[..., 2]) > 40).astype(np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+
+        stats = stats[1:]  # Drop the background component
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= 0.0005 * mask.size]
+        if len(stats) == 0:
+            return np.zeros((0, 6), dtype=np.float32)
+
+        x, y = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+        w, h = stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT]
+        area = stats[:, cv2.CC_STAT_AREA].astype(np.float32)
+        det = np.empty((len(stats), 6), dtype=np.float32)
+        det[:, 0], det[:, 1] = x / scale, y / scale
+        det[:, 2], det[:, 3] = (x + w) / scale, (y + h) / scale
+        det[:, 4] = np.clip(0.3 + area / (w * h) * 0.6, 0, 0.95)  # Fill ratio as a confidence proxy
+        det[:, 5] = (area >= np.median(area)).astype(np.float32)  # 0: Weed, 1: Paddy
+
+        keep = det[:, 4] >= self.conf
+        if self.classes is not None:
+            keep &= np.isin(det[:, 5], self.classes)
+        return det[keep]
+
+    def __call__(self, images, size=None):
+        size = size or self.size
+        batch = images if isinstance(images, list) else [images]
+
+        start = time.perf_counter()
+        loaded = [self._load(image) for image in batch]
+        preprocess = time.perf_counter()
+        xyxy = [self._detect(image, size) for image in loaded]
+        done = time.perf_counter()
+
+        per_image = 1000 / len(batch)
+        return StandInDetections(xyxy, ((preprocess - start) * per_image, (done - preprocess) * per_image, 0.0))
@@ -148,7 +148,7 @@ document.addEventListener('DOMContentLoaded', function () {
                 const entry = detectionHistory[index];
 
                 // Display the original and result images
-                originalImage.innerHTML = `<img src="${entry.image.replace('predicted_', '')}" class="img-fluid">`;
+                originalImage.innerHTML = `<img src="${entry.fullData.original || entry.image.replace('predicted_', '')}" class="img-fluid">`;
                 originalImage.querySelector('img').style.maxWidth = '100%';
                 originalImage.querySelector('img').style.maxHeight = '100%';
                 originalImage.querySelector('img').style.objectFit = 'contain';
@@ -260,6 +260,10 @@
             let historyIndex = -1;
             let lastProcessingTime = 0;
             let frameTimes = [];
+            let streamId = null;  // Lets the server skip inference while the view is unchanged
+            let liveSocket = null;  // Persistent /live channel; frames fall back to POSTs without it
+            let liveSeq = 0;
+            let liveSent = new Map();  // seq -> {timestamp, startTime} of frames awaiting results
 
             // Canvas context
             const ctx = detectionCanvas.getContext('2d');
@@ -311,6 +315,7 @@
                 }
 
                 if (isProcessing) return;
+                streamId = Date.now().toString(36) + Math.random().toString(36).slice(2, 8);
 
                 // Initialize processing
                 isProcessing = true;
@@ -326,7 +331,8 @@
                 detectionCanvas.width = videoPlayer.videoWidth;
                 detectionCanvas.height = videoPlayer.videoHeight;
 
-                // Start processing frames
+                // Open the live channel, then start processing frames
+                openLiveSocket();
                 processCurrentFrame();
 
                 // Also process frames on timeupdate (when video plays)
@@ -342,8 +348,12 @@
                 stopProcessingBtn.disabled = true;
                 processingIndicator.style.display = 'none';
 
-                // Remove timeupdate listener
+                // Remove timeupdate listener and close the live channel
                 videoPlayer.removeEventListener('timeupdate', processCurrentFrame);
+                if (liveSocket) {
+                    liveSocket.close();
+                    liveSocket = null;
+                }
 
                 // Enable frame navigation buttons
                 prevFrameBtn.disabled = false;
@@ -403,6 +413,52 @@
             }
 
 
+            // Open the WebSocket channel: the server only processes the newest frame and drops stale ones
+            function openLiveSocket() {
+                if (!('WebSocket' in window)) return;
+
+                const socket = new WebSocket('ws://localhost:8800/live?stream_id=' + streamId);
+                liveSeq = 0;
+                liveSent = new Map();
+
+                socket.onopen = function() {
+                    liveSocket = socket;
+                };
+                socket.onmessage = function(event) {
+                    const response = JSON.parse(event.data);
+                    const sent = liveSent.get(response.seq);
+                    // Frames before this one were dropped by the server and will get no results
+                    for (const seq of liveSent.keys()) {
+                        if (seq <= response.seq) liveSent.delete(seq);
+                    }
+                    if (!sent || response.type !== 'detections') return;
+
+                    const processingTime = performance.now() - sent.startTime;
+                    showFrameResult({
+                        timestamp: sent.timestamp,
+                        results: response.results,
+                        statistics: response.statistics,
+                        processingTime: processingTime
+                    });
+                    processingIndicator.style.display = 'none';
+                    socket.send(JSON.stringify({type: 'ack', seq: response.seq, latency_ms: processingTime}));
+                };
+                socket.onclose = function() {
+                    if (liveSocket === socket) liveSocket = null;
+                };
+            }
+
+            // Add a processed frame to the history and draw it
+            function showFrameResult(frameData) {
+                frameHistory.push(frameData);
+                historyIndex = frameHistory.length - 1;
+
+                drawDetectionBoxes(frameData);
+                updateStatistics(frameData.statistics);
+                updatePerformanceMetrics(frameData.processingTime);
+                updateNavigationButtons();
+            }
+
             function processCurrentFrame() {
                 if (!isProcessing) return;
 
@@ -428,50 +484,46 @@
                     return;
                 }
 
-                // Get image data for processing
-                const imageData = detectionCanvas.toDataURL('image/jpeg', 0.8);
-
-                // Send frame to server for processing
-                $.ajax({
-                    url: 'http://localhost:8800/process-frame',
-                    type: 'POST',
-                    data: JSON.stringify({
-                        image: imageData
-                    }),
-                    contentType: 'application/json',
-                    headers: {
-                        'Accept': 'application/json',
-                        'Content-Type': 'application/json'
-                    },
-                    success: function(response) {
-                        if (response.status === 'success') {
-                            const frameData = {
-                                timestamp: currentTime,
-                                results: response.results,
-                                statistics: response.statistics,
-                                processingTime: performance.now() - startTime
-                            };
-
-                            // Add to history if not duplicate
-                            if (existingFrameIndex === -1) {
-                                frameHistory.push(frameData);
-                                historyIndex = frameHistory.length - 1;
-                            }
+                // Encode the frame as raw JPEG bytes and send them without base64/JSON wrapping
+                detectionCanvas.toBlob(function(frameBlob) {
+                    if (liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+                        // Skip this frame while the previous one is still being sent
+                        if (liveSocket.bufferedAmount > 0) return;
+                        liveSeq += 1;
+                        liveSent.set(liveSeq, {timestamp: currentTime, startTime: startTime});
+                        liveSocket.send(frameBlob);
+                        return;
+                    }
 
-                            // Draw results
-                            drawDetectionBoxes(frameData);
-                            updateStatistics(frameData.statistics);
-                            updatePerformanceMetrics(frameData.processingTime);
-                            updateNavigationButtons();
+                    $.ajax({
+                        url: 'http://localhost:8800/process-frame?stream_id=' + streamId,
+                        type: 'POST',
+                        data: frameBlob,
+                        processData: false,
+                        contentType: 'application/octet-stream',
+                        headers: {
+                            'Accept': 'application/json'
+                        },
+                        success: function(response) {
+                            if (response.status === 'success') {
+                                const frameData = {
+                                    timestamp: currentTime,
+                                    results: response.results,
+                                    statistics: response.statistics,
+                                    processingTime: performance.now() - startTime
+                                };
+
+                                showFrameResult(frameData);
+                            }
+                        },
+                        error: function(xhr, status, error) {
+                            console.error('Error processing frame:', error);
+                        },
+                        complete: function() {
+                            processingIndicator.style.display = 'none';
                         }
-                    },
-                    error: function(xhr, status, error) {
-                        console.error('Error processing frame:', error);
-                    },
-                    complete: function() {
-                        processingIndicator.style.display = 'none';
-                    }
-                });
+                    });
+                }, 'image/jpeg', 0.8);
             }
 
             // Improved display frame results function
@@ -537,10 +589,11 @@
                 weedDensity.textContent = `${stats.weed_density.toFixed(1)}%`;
                 weedDensity.setAttribute('aria-valuenow', stats.weed_density);
 
-                // Update summary
-                totalPaddy.textContent = stats.paddy_count;
-                totalWeed.textContent = stats.weed_count;
-                weedPercent.textContent = `${stats.weed_density.toFixed(1)}%`;
+                // Update summary: tracked streams count each plant once for the whole video
+                const totals = stats.tracking;
+                totalPaddy.textContent = totals ? totals.unique_paddy : stats.paddy_count;
+                totalWeed.textContent = totals ? totals.unique_weeds : stats.weed_count;
+                weedPercent.textContent = `${(totals ? totals.unique_weed_density : stats.weed_density).toFixed(1)}%`;
             }
 
             // Function to update performance metrics
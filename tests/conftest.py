@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# The application modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def stand_in_app(tmp_path, monkeypatch):
+    """app.py on the stand-in detector, writing nothing into the repository (needs torch)"""
+    pytest.importorskip('torch')
+    monkeypatch.setenv('MODEL_BACKEND', 'stand-in')
+    monkeypatch.chdir(tmp_path)
+    import app
+    from rendering import AnnotationRenderer
+    from result_cache import ResultCache
+
+    monkeypatch.setattr(app, 'SAVE_UPLOADS', False)
+    monkeypatch.setattr(app, 'renderer', AnnotationRenderer(str(tmp_path), background=False))
+    monkeypatch.setattr(app, 'result_cache', ResultCache())
+    return app
@@ -0,0 +1,86 @@
+import io
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, DeadlineExceeded, Overloaded, check_deadline
+
+
+def _queue_in_thread(controller, priority, order):
+    def run():
+        with controller.acquire(priority):
+            order.append(priority)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_queued(controller, count):
+    for _ in range(500):
+        if sum(controller.stats()['queued'].values()) == count:
+            return
+        time.sleep(0.01)
+    raise AssertionError('requests did not queue')
+
+
+def test_full_queue_is_rejected_with_429_and_retry_after():
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    ticket = controller.acquire('live')
+    with pytest.raises(Overloaded) as info:
+        controller.acquire('live')
+    assert info.value.status == 429 and info.value.retry_after >= 1
+    ticket.release()
+    assert controller.stats()['requests']['live'] == {'admitted': 1, 'rejected': 1, 'expired': 0}
+
+
+def test_bulk_requests_fill_only_part_of_the_queue():
+    controller = AdmissionController(max_concurrent=1, max_queue=2, max_bulk_queue=1)
+    ticket = controller.acquire('bulk')
+    order = []
+    waiting = _queue_in_thread(controller, 'bulk', order)
+    _wait_queued(controller, 1)
+    with pytest.raises(Overloaded):
+        controller.acquire('bulk')
+    live = _queue_in_thread(controller, 'live', order)  # Live traffic still has room
+    _wait_queued(controller, 2)
+
+    ticket.release()
+    waiting.join(5)
+    live.join(5)
+    assert order == ['live', 'bulk']
+
+
+def test_request_still_queued_at_its_deadline_gets_503():
+    controller = AdmissionController(max_concurrent=1, max_queue=4)
+    ticket = controller.acquire('bulk')
+    with pytest.raises(DeadlineExceeded) as info:
+        controller.acquire('bulk', deadline=time.monotonic() + 0.05)
+    assert info.value.status == 503 and info.value.retry_after >= 1
+    stats = controller.stats()
+    assert stats['queued'] == {'live': 0, 'bulk': 0} and stats['requests']['bulk']['expired'] == 1
+    ticket.release()
+    assert controller.stats()['active'] == 0
+
+
+def test_retry_after_follows_slot_hold_times():
+    controller = AdmissionController(max_concurrent=1, max_queue=4)
+    controller._release(3000)  # One request that held its slot for 3 s
+    controller._active += 1
+    assert controller.retry_after() == 3
+
+
+def test_check_deadline():
+    check_deadline(None)
+    check_deadline(time.monotonic() + 10)
+    with pytest.raises(DeadlineExceeded):
+        check_deadline(time.monotonic() - 1)
+
+
+def test_overloaded_requests_answer_with_retry_after(stand_in_app, monkeypatch):
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(stand_in_app, 'admission', controller)
+    with controller.acquire('live'):  # The only slot is taken and nothing may queue
+        response = stand_in_app.app.test_client().post('/predict', data={'file': (io.BytesIO(b'x'), 'a.jpg')})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(response.get_json()['retry_after'])
@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from admission import DeadlineExceeded
+from batching import BatchInferenceEngine
+
+
+class _Results:
+    def __init__(self, images):
+        self.images = images
+
+    def tolist(self):
+        return list(self.images)
+
+
+class _Model:
+    """Records every forward pass; the first one blocks until `release` is set"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, images, size=None):
+        self.calls.append(list(images))
+        self.started.set()
+        self.release.wait(5)
+        return _Results(images)
+
+
+def test_live_images_are_taken_ahead_of_queued_bulk_images():
+    model = _Model()
+    engine = BatchInferenceEngine(model, max_batch_size=2, max_wait_ms=1)
+    blocker = engine._enqueue('blocker', None, None, None, 'bulk')
+    assert model.started.wait(5)  # The worker is busy, so the rest queues up
+
+    bulk = [engine._enqueue(f'bulk-{i}', None, None, None, 'bulk') for i in range(4)]
+    live = engine._enqueue('live', None, None, None, 'live')
+    model.release.set()
+    assert [future.result(5) for future in bulk] == [f'bulk-{i}' for i in range(4)]
+    assert live.result(5) == 'live' and blocker.result(5) == 'blocker'
+
+    assert model.calls[1] == ['live', 'bulk-0']
+    engine.stop()
+
+
+def test_stop_answers_everything_already_queued():
+    model = _Model()
+    engine = BatchInferenceEngine(model, max_batch_size=1, max_wait_ms=1)
+    futures = [engine._enqueue(i, None, None, None, 'bulk') for i in range(4)]
+    assert model.started.wait(5)
+
+    engine.stop()
+    model.release.set()
+    assert [future.result(5) for future in futures] == [0, 1, 2, 3]
+    engine._worker.join(5)
+    assert not engine._worker.is_alive()
+    with pytest.raises(RuntimeError):
+        engine.submit('late')
+
+
+def test_requests_in_one_window_share_a_forward_pass_per_size():
+    model = _Model()
+    model.release.set()
+    engine = BatchInferenceEngine(model, max_batch_size=8, max_wait_ms=200)
+    futures = [engine._enqueue(name, size, None, None, 'bulk')
+               for name, size in [('a', 320), ('b', 640), ('c', 320), ('d', None)]]
+    assert [future.result(5) for future in futures] == ['a', 'b', 'c', 'd']
+    assert sorted(model.calls) == [['a', 'c'], ['b'], ['d']]
+    engine.stop()
+    engine._worker.join(5)  # Stats are recorded after the results are handed out
+    assert engine.stats()['batches'] == 1 and engine.stats()['largest_batch_size'] == 4
+
+
+def test_model_errors_and_expired_deadlines_fail_only_their_requests():
+    class _Failing(_Model):
+        def __call__(self, images, size=None):
+            if size == 320:
+                raise ValueError('bad input')
+            return super().__call__(images, size)
+
+    model = _Failing()
+    model.release.set()
+    engine = BatchInferenceEngine(model, max_batch_size=8, max_wait_ms=200)
+    failing = engine._enqueue('a', 320, None, None, 'bulk')
+    expired = engine._enqueue('b', 640, 0.0, None, 'bulk')
+    ok = engine._enqueue('c', 640, None, None, 'bulk')
+    with pytest.raises(ValueError):
+        failing.result(5)
+    with pytest.raises(DeadlineExceeded):
+        expired.result(5)
+    assert ok.result(5) == 'c'
+    engine.stop()
+    engine._worker.join(5)
+    assert engine.stats()['expired'] == 1
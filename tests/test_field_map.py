@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+import pytest
+
+from field_map import FieldMap, SurveySessions, centers_from_det, centers_from_results
+
+
+def _jpeg(width=400, height=400):
+    ok, buffer = cv2.imencode('.jpg', np.zeros((height, width, 3), dtype=np.uint8))
+    return buffer.tobytes()
+
+
+def test_grid_images_are_binned_into_their_cells():
+    survey = FieldMap(mode='grid', cell_size=0.25)
+    image = _jpeg()
+    first = survey.placement({}, image, 'r1_c2.jpg')
+    # Two weeds and a paddy in the top-left quarter-cell, one paddy in the bottom-right one
+    stats = survey.add([[50, 50], [60, 40], [20, 90], [390, 390]], np.array([True, True, False, False]), first)
+    assert stats['images'] == 1 and stats['weed_count'] == 2 and stats['paddy_count'] == 2
+
+    heatmap = survey.heatmap()
+    assert heatmap['origin'] == [2.0, 1.0] and heatmap['shape'] == [4, 4]
+    assert heatmap['weed'][0][0] == 2 and heatmap['paddy'][0][0] == 1 and heatmap['paddy'][3][3] == 1
+    assert heatmap['density'][0][0] == pytest.approx(66.67) and heatmap['density'][1][1] is None
+
+    # A later image to the left grows the grid without losing the earlier counts
+    second = survey.placement({'row': '1', 'col': '0'}, image)
+    survey.add([[50, 50]], np.array([True]), second)
+    cells = {(cell['row'], cell['col']): cell for cell in survey.heatmap(sparse=True)['cells']}
+    assert cells[(0, 0)]['weed'] == 1 and cells[(0, 8)]['weed'] == 2 and cells[(3, 11)]['paddy'] == 1
+
+
+def test_geo_images_are_placed_in_metres_from_the_first_image():
+    survey = FieldMap(mode='geo', cell_size=5.0, footprint_m=20.0)
+    image = _jpeg()
+    first = survey.placement({'lat': '10.0', 'lon': '100.0'}, image)
+    survey.add([[200, 200]], np.array([True]), first)  # Image centre
+    east = 12.0 / (111320.0 * np.cos(np.radians(10.0)))
+    second = survey.placement({'lat': '10.0', 'lon': str(100.0 + east)}, image)
+    survey.add([[200, 200]], np.array([False]), second)
+
+    heatmap = survey.heatmap(sparse=True)
+    assert heatmap['geo_origin'] == (10.0, 100.0)
+    assert [(cell['row'], cell['col'], cell['weed'], cell['paddy']) for cell in heatmap['cells']] == \
+        [(0, 0, 1, 0), (0, 2, 0, 1)]
+
+
+def test_placement_errors():
+    with pytest.raises(ValueError):
+        FieldMap(mode='grid').placement({}, _jpeg(), 'no-grid-position.jpg')
+    with pytest.raises(ValueError):
+        FieldMap(mode='geo').placement({}, _jpeg())
+    with pytest.raises(ValueError):
+        FieldMap(mode='grid').placement({'row': 'x', 'col': '1'}, _jpeg())
+    with pytest.raises(ValueError):
+        FieldMap(mode='grid', cell_size=1e-4).placement({'row': '0', 'col': '0'}, _jpeg())
+    with pytest.raises(ValueError):
+        FieldMap(mode='spiral')
+
+
+def test_render_png_and_centers():
+    survey = FieldMap(mode='grid')
+    assert survey.render_png() is None
+    centers, weeds = centers_from_det(np.array([[0, 0, 10, 20, 0.9, 0], [10, 10, 30, 30, 0.8, 1]], dtype=np.float32))
+    assert centers.tolist() == [[5, 10], [20, 20]] and weeds.tolist() == [True, False]
+    centers, weeds = centers_from_results([{'bbox': [5, 10, 10, 20], 'class': 'Weed'}])
+    assert centers.tolist() == [[5, 10]] and weeds.tolist() == [True]
+
+    survey.add(centers, weeds, survey.placement({'row': '0', 'col': '0'}, _jpeg()))
+    png = survey.render_png(cell_px=8)
+    assert cv2.imdecode(np.frombuffer(png, dtype=np.uint8), cv2.IMREAD_COLOR).shape == (8, 8, 3)
+
+
+def test_survey_sessions_are_bounded():
+    sessions = SurveySessions(max_surveys=1)
+    survey = sessions.create(name='north field')
+    with pytest.raises(ValueError):
+        sessions.create()
+    assert sessions.get(survey.id) is survey and sessions.list()[0]['name'] == 'north field'
+    assert sessions.remove(survey.id) and sessions.get(survey.id) is None
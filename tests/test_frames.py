@@ -0,0 +1,42 @@
+import base64
+import io
+
+import cv2
+import numpy as np
+import pytest
+from flask import Flask, request
+
+from frames import decode_image_bytes, read_frame_bytes
+
+app = Flask(__name__)
+
+
+def _jpeg():
+    ok, buffer = cv2.imencode('.jpg', np.zeros((48, 64, 3), dtype=np.uint8))
+    return buffer.tobytes()
+
+
+def _read(**kwargs):
+    with app.test_request_context('/process-frame', method='POST', **kwargs):
+        return read_frame_bytes(request)
+
+
+def test_raw_multipart_and_base64_bodies():
+    image = _jpeg()
+    assert _read(data=image, content_type='image/jpeg') == image
+    assert _read(data=image, content_type='application/octet-stream') == image
+    assert _read(data={'frame': (io.BytesIO(image), 'f.jpg')}) == image
+    data_url = 'data:image/jpeg;base64,' + base64.b64encode(image).decode()
+    assert _read(json={'image': data_url}) == image
+    assert decode_image_bytes(image).shape == (48, 64, 3)
+
+
+@pytest.mark.parametrize('body', [{}, {'image': 12}, {'image': None}, {'image': ['x']}, ['image'], 'image',
+                                  {'image': 'not base64!'}, {'image': ''}])
+def test_unusable_json_bodies_read_as_no_frame(body):
+    assert _read(json=body) is None
+
+
+def test_empty_bodies_read_as_no_frame():
+    assert _read(data=b'', content_type='image/jpeg') is None
+    assert _read(data={}) is None
@@ -0,0 +1,61 @@
+import pytest
+
+import metrics_store
+from metrics_store import MetricsHistory
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metrics_store.time, 'time', lambda: now[0])
+    return now
+
+
+def _request(iteration, inference_time=0.01, status='success', **extra):
+    return {'iteration': iteration, 'inference_time': inference_time, 'weed_count': 1, 'paddy_count': 3,
+            'total_objects': 4, 'weed_density': 25.0, 'avg_confidence': 0.5, 'status': status, **extra}
+
+
+def test_ring_buffer_keeps_the_newest_entries(clock):
+    history = MetricsHistory(capacity=3)
+    for i in range(5):
+        history.append(_request(i, filename=f'{i}.jpg'))
+
+    assert len(history) == 3 and history.total_recorded == 5
+    rows = history.latest(10)
+    assert [row['iteration'] for row in rows] == [2, 3, 4]
+    assert rows[-1]['filename'] == '4.jpg' and rows[-1]['kind'] == 'inferred'
+    assert [row['iteration'] for row in history.latest(2)] == [3, 4]
+
+
+def test_error_rows_keep_their_message(clock):
+    history = MetricsHistory(capacity=4)
+    history.append({'iteration': 1, 'status': 'error', 'error': 'Could not decode'})
+    assert history.latest(1)[0]['status'] == 'error' and history.latest(1)[0]['error'] == 'Could not decode'
+
+
+def test_window_only_aggregates_recent_requests(clock):
+    history = MetricsHistory(capacity=4)
+    for i, inference_time in enumerate([0.5, 0.5, 0.01, 0.03, 0.02]):  # Wraps the buffer once
+        clock[0] = 1000.0 + i * 10
+        history.append(_request(i, inference_time))
+    history.append(_request(5, status='error'))
+
+    window = history.window(25, now=1045.0)
+    assert window['requests'] == 4  # Requests at 1020, 1030, 1040 and the error at 1040
+    assert window['error_rate'] == 0.25
+    assert window['p50_latency_ms'] == pytest.approx(20, abs=0.01)
+    assert window['throughput_rps'] == round(4 / 25, 4)
+    assert history.window(1, now=2000.0)['requests'] == 0
+
+
+def test_reused_results_stay_out_of_the_latency_percentiles(clock):
+    history = MetricsHistory()
+    history.append(_request(1, 0.04))
+    for kind in ('skipped', 'tracked', 'cached'):
+        history.append(_request(2, 0.0, kind=kind))
+
+    window = history.window(60, now=1001.0)
+    assert window['inferences'] == 1 and window['reused_results'] == 3
+    assert window['p50_latency_ms'] == window['p99_latency_ms'] == pytest.approx(40, abs=0.01)
+    assert [row['kind'] for row in history.latest(3)] == ['skipped', 'tracked', 'cached']
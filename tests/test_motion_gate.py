@@ -0,0 +1,73 @@
+import cv2
+import numpy as np
+
+from motion_gate import THUMBNAIL_WIDTH, MotionGate, frame_thumbnail
+from tracking import gray_thumbnail
+
+
+def _jpeg(image):
+    ok, buffer = cv2.imencode('.jpg', image)
+    return buffer.tobytes()
+
+
+def _thumbnail(level, shape=(36, 64)):
+    return np.full(shape, level, dtype=np.int16)
+
+
+def test_frame_thumbnail_is_small_greyscale():
+    thumb = frame_thumbnail(_jpeg(np.full((480, 640, 3), 128, dtype=np.uint8)))
+    assert thumb.shape == (120, THUMBNAIL_WIDTH) and thumb.dtype == np.int16
+    assert frame_thumbnail(_jpeg(np.full((240, 320, 3), 128, dtype=np.uint8))).shape == (120, THUMBNAIL_WIDTH)
+    assert frame_thumbnail(b'not an image') is None
+
+
+def test_live_and_video_thumbnails_match():
+    frame = np.random.default_rng(1).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (15, 15), 0)
+    live = frame_thumbnail(_jpeg(frame))
+    video = gray_thumbnail(cv2.imdecode(np.frombuffer(_jpeg(frame), dtype=np.uint8), cv2.IMREAD_COLOR))
+    assert live.shape == video.shape
+    assert np.abs(live - video.astype(np.int16)).mean() < 2
+
+
+def test_unchanged_frames_reuse_the_last_detections():
+    gate = MotionGate(threshold=4.0)
+    assert gate.check('cam', _thumbnail(100)) is None  # Nothing inferred yet
+    gate.update('cam', _thumbnail(100), ['box'], {'weed_count': 1})
+
+    assert gate.check('cam', _thumbnail(102)) == (['box'], {'weed_count': 1})
+    assert gate.check('cam', _thumbnail(110)) is None
+    stats = gate.stream_stats('cam')
+    assert stats['frames'] == 3 and stats['skipped'] == 1 and stats['last_diff'] == 10.0
+
+
+def test_slow_drift_is_compared_with_the_last_inferred_frame():
+    gate = MotionGate(threshold=4.0)
+    gate.update('cam', _thumbnail(100), [], {})
+    assert gate.check('cam', _thumbnail(102)) is not None
+    assert gate.check('cam', _thumbnail(104)) is None  # 2 per frame, but 4 since the last inference
+
+
+def test_max_skips_forces_a_fresh_inference():
+    gate = MotionGate(threshold=4.0, max_skips=2)
+    gate.update('cam', _thumbnail(100), [], {})
+    assert gate.check('cam', _thumbnail(100)) is not None
+    assert gate.check('cam', _thumbnail(100)) is not None
+    assert gate.check('cam', _thumbnail(100)) is None
+
+
+def test_streams_and_thresholds_are_independent():
+    gate = MotionGate(threshold=4.0)
+    gate.update('a', _thumbnail(100), [], {})
+    gate.update('b', _thumbnail(100), [], {})
+    assert gate.check('a', _thumbnail(103)) is not None
+    assert gate.check('b', _thumbnail(103), threshold=2.0) is None
+    assert gate.check('b', _thumbnail(100, shape=(10, 64))) is None  # Resolution changed
+    assert gate.stats()['active_streams'] == 2
+
+
+def test_old_streams_are_forgotten():
+    gate = MotionGate(max_streams=2)
+    for stream_id in ('a', 'b', 'c'):
+        gate.update(stream_id, _thumbnail(100), [], {})
+    assert gate.stream_stats('a') is None and set(gate.stats()['streams']) == {'b', 'c'}
@@ -0,0 +1,79 @@
+import io
+import json
+import os
+import zipfile
+
+import cv2
+import numpy as np
+from flask import Flask, Response, request
+
+from batch_predict import SpooledUploads, iter_batch_predictions
+
+
+def _jpeg(seed):
+    rng = np.random.default_rng(seed)
+    ok, buffer = cv2.imencode('.jpg', rng.integers(0, 256, (48, 64, 3), dtype=np.uint8))
+    return buffer.tobytes()
+
+
+def _zip(names):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        for seed, name in enumerate(names):
+            archive.writestr(name, _jpeg(100 + seed))
+    return data.getvalue()
+
+
+def _multipart():
+    return {'files': [(io.BytesIO(_jpeg(1)), 'a.jpg'), (io.BytesIO(_jpeg(2)), 'b.png'),
+                      (io.BytesIO(_zip(['z/c.jpg', 'z/d.jpg'])), 'more.zip')]}
+
+
+class _Detections:
+    def __init__(self):
+        self.xyxy = [np.array([[1, 2, 11, 12, 0.9, 0], [5, 5, 9, 9, 0.8, 1]], dtype=np.float32)]
+
+
+class _Engine:
+    def submit_many(self, images, timeout=None, size=None, deadline=None, profile=None):
+        return [_Detections() for _ in images]
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_spooled_uploads_survive_streaming():
+    app = Flask(__name__)
+    spooled = []
+
+    @app.route('/batch', methods=['POST'])
+    def batch():
+        uploads = SpooledUploads(request)
+        spooled.append(uploads.directory)
+
+        def generate():
+            try:
+                for record in iter_batch_predictions(_Engine(), uploads, batch_size=3):
+                    yield json.dumps(record) + '\n'
+            finally:
+                uploads.cleanup()
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    records = _lines(app.test_client().post('/batch', data=_multipart()))
+    images = [record for record in records if record['type'] == 'image']
+    assert [record['filename'] for record in images] == ['a.jpg', 'b.png', 'z/c.jpg', 'z/d.jpg']
+    assert all(record['status'] == 'success' and len(record['results']) == 2 for record in images)
+    assert records[-1]['type'] == 'summary' and records[-1]['images_processed'] == 4
+    assert not os.path.exists(spooled[0])
+
+
+def test_predict_batch_endpoint(stand_in_app):
+    client = stand_in_app.app.test_client()
+    records = _lines(client.post('/predict-batch', data=_multipart()))
+    assert [record['type'] for record in records] == ['image'] * 4 + ['summary']
+    assert all(record['status'] == 'success' for record in records)
+
+    records = _lines(client.post('/predict-batch', data=_zip(['x.jpg', 'y.jpg']), content_type='application/zip'))
+    assert [record['filename'] for record in records[:-1]] == ['x.jpg', 'y.jpg']
+    assert records[-1]['images_processed'] == 2
@@ -0,0 +1,78 @@
+import io
+import json
+import os
+
+import cv2
+import numpy as np
+
+from result_cache import ResultCache, cache_key
+
+
+def _size(value):
+    return len(json.dumps(value))
+
+
+def test_cache_key_covers_image_and_settings():
+    assert cache_key(b'image', {'size': 640}) == cache_key(b'image', {'size': 640})
+    assert cache_key(b'image', {'size': 640}) != cache_key(b'image', {'size': 320})
+    assert cache_key(b'image', {'size': 640}) != cache_key(b'other', {'size': 640})
+
+
+def test_memory_tier_evicts_least_recently_used():
+    value = {'results': [1, 2, 3]}
+    cache = ResultCache(max_bytes=2 * _size(value))
+    cache.put('a', value)
+    cache.put('b', value)
+    assert cache.get('a') == value  # 'b' is now the least recently used
+    cache.put('c', value)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == value and cache.get('c') == value
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['evictions'] == 1
+    assert stats['memory_hits'] == 3 and stats['misses'] == 1
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path))
+    cache.put('key', {'results': []})
+
+    restarted = ResultCache(cache_dir=str(tmp_path))
+    assert restarted.stats()['disk_bytes'] == _size({'results': []})
+    assert restarted.get('key') == {'results': []}
+    assert restarted.get('key') == {'results': []}
+    stats = restarted.stats()
+    assert stats['disk_hits'] == 1 and stats['memory_hits'] == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_disk_tier_stays_within_budget(tmp_path):
+    value = {'results': 'x' * 100}
+    cache = ResultCache(cache_dir=str(tmp_path), max_disk_bytes=3 * _size(value))
+    for i in range(5):
+        cache.put(f'key-{i}', value)
+        os.utime(tmp_path / f'key-{i}.json', (i, i))  # Distinct recency regardless of timer resolution
+
+    assert sorted(os.listdir(tmp_path)) == ['key-2.json', 'key-3.json', 'key-4.json']
+    stats = cache.stats()
+    assert stats['disk_bytes'] == 3 * _size(value) and stats['disk_evictions'] == 2
+
+
+def test_invalidate_removes_both_tiers(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path))
+    cache.put('key', {'results': []})
+    cache.invalidate('key')
+    assert cache.get('key') is None
+    assert cache.stats()['disk_bytes'] == 0 and cache.stats()['memory_bytes'] == 0
+
+
+def test_repeated_upload_is_answered_from_the_cache(stand_in_app):
+    ok, image = cv2.imencode('.jpg', np.random.default_rng(7).integers(0, 256, (48, 64, 3), dtype=np.uint8))
+    client = stand_in_app.app.test_client()
+
+    def post():
+        return client.post('/predict', data={'file': (io.BytesIO(image.tobytes()), 'field.jpg')}).get_json()
+
+    first, second = post(), post()
+    assert first['status'] == 'success' and first['cached'] is False
+    assert second['cached'] is True and second['results'] == first['results']
@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+import pytest
+
+from admission import DeadlineExceeded
+from tiling import merge_detections, tile_windows, tiled_inference
+
+
+def _det(*rows):
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+
+def test_tile_windows_cover_the_image_flush_with_the_edges():
+    windows = tile_windows(1000, 1500, tile_size=640, overlap=0.2)
+    assert {x0 for x0, _, _, _ in windows} == {0, 512, 860}
+    assert {y0 for _, y0, _, _ in windows} == {0, 360}
+    assert all(x1 - x0 == 640 and y1 - y0 == 640 for x0, y0, x1, y1 in windows)
+    assert tile_windows(300, 200, tile_size=640) == [(0, 0, 200, 300)]
+
+
+def test_merge_keeps_the_full_box_over_a_seam_truncated_copy():
+    # The truncated copy has a low IoU with the full box but lies almost entirely inside it
+    det = _det([100, 100, 200, 200, 0.9, 0], [100, 100, 130, 200, 0.6, 0])
+    merged = merge_detections(det, threshold=0.6)
+    assert merged.tolist() == [[100, 100, 200, 200, pytest.approx(0.9), 0]]
+
+
+def test_merge_keeps_overlapping_boxes_of_different_classes_and_separate_boxes():
+    det = _det([0, 0, 50, 50, 0.5, 0], [0, 0, 50, 50, 0.8, 1], [300, 300, 350, 350, 0.7, 0])
+    merged = merge_detections(det)
+    assert len(merged) == 3
+    assert merged[:, 4].tolist() == pytest.approx([0.8, 0.7, 0.5])  # Highest confidence first
+    assert len(merge_detections(_det())) == 0
+
+
+class _Results:
+    def __init__(self, det):
+        self.xyxy = [det]
+
+
+class _Engine:
+    """Finds one 20 px box at the same spot of every tile"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def submit_many(self, tiles, timeout=None, size=None, deadline=None, profile=None):
+        self.calls.append(len(tiles))
+        time.sleep(self.delay)
+        return [_Results(_det([10, 10, 30, 30, 0.9, 1])) for _ in tiles]
+
+
+def test_tiled_inference_maps_boxes_back_and_limits_tiles_in_flight():
+    engine = _Engine()
+    det, tiles = tiled_inference(engine, np.zeros((1000, 1500, 3), dtype=np.uint8), size=640, max_in_flight=4)
+    assert tiles == 6 and engine.calls == [4, 2]
+    assert sorted(det[:, 0].tolist()) == [10, 10, 522, 522, 870, 870]
+    assert sorted(set(det[:, 1].tolist())) == [10, 370]
+
+
+def test_tiled_inference_stops_at_the_deadline():
+    engine = _Engine(delay=0.05)
+    with pytest.raises(DeadlineExceeded):
+        tiled_inference(engine, np.zeros((2000, 2000, 3), dtype=np.uint8), size=640, max_in_flight=2,
+                        deadline=time.monotonic() + 0.02)
+    assert engine.calls == [2]
@@ -0,0 +1,68 @@
+import numpy as np
+
+from tracking import StreamTrackers, Tracker, gray_thumbnail, with_track_ids
+
+WEED, PADDY = 0, 1
+
+
+def _det(*rows):
+    return np.array(rows, dtype=np.float32).reshape(-1, 6)
+
+
+def test_ids_stay_stable_while_boxes_move_a_little():
+    tracker = Tracker()
+    _, first = tracker.update(_det([10, 10, 50, 50, 0.9, WEED], [100, 100, 140, 140, 0.8, PADDY]), frame_size=(640, 480))
+    _, second = tracker.update(_det([104, 102, 144, 142, 0.8, PADDY], [12, 11, 52, 51, 0.9, WEED]))
+    assert first.tolist() == [1, 2] and second.tolist() == [2, 1]
+
+    _, third = tracker.update(_det([300, 300, 340, 340, 0.7, WEED], [14, 12, 54, 52, 0.9, WEED]))
+    assert third.tolist() == [3, 1]  # A new plant gets a new id
+
+
+def test_totals_count_each_confirmed_plant_once_by_majority_class():
+    tracker = Tracker(min_hits=2)
+    for cls in (WEED, PADDY, WEED):  # One plant whose class flickers
+        tracker.update(_det([10, 10, 50, 50, 0.9, cls], [200, 200, 240, 240, 0.9, PADDY]), frame_size=(640, 480))
+    tracker.update(_det([400, 400, 440, 440, 0.6, WEED]))  # Seen once: not confirmed
+
+    totals = tracker.totals()
+    assert totals['unique_weeds'] == 1 and totals['unique_paddy'] == 1
+    assert totals['tracks'] == 3 and totals['keyframes'] == 4
+
+
+def test_tracks_missed_too_long_are_finished_but_still_counted():
+    tracker = Tracker(max_missed=1, min_hits=1)
+    tracker.update(_det([10, 10, 50, 50, 0.9, WEED]), frame_size=(640, 480))
+    tracker.update(_det())
+    assert tracker.current()[1].tolist() == []
+    tracker.update(_det())
+    _, ids = tracker.update(_det([10, 10, 50, 50, 0.9, WEED]))
+    assert ids.tolist() == [2]  # The old track was dropped, so the plant starts a new one
+    assert tracker.totals()['unique_weeds'] == 2
+
+
+def test_boxes_follow_the_camera_between_keyframes():
+    rng = np.random.default_rng(0)
+    field = rng.integers(0, 256, (480, 800, 3), dtype=np.uint8)
+    tracker = Tracker(keyframe_interval=3)
+    assert tracker.needs_detection()
+    tracker.update(_det([300, 200, 340, 240, 0.9, WEED]), gray_thumbnail(field[:, :640]), (640, 480))
+    assert not tracker.needs_detection()
+
+    # The camera pans right by 40 px, so the plant moves 40 px to the left in the frame
+    det, ids = tracker.propagate(gray_thumbnail(field[:, 40:680]))
+    assert ids.tolist() == [1]
+    assert abs(det[0, 0] - 260) <= 4 and abs(det[0, 1] - 200) <= 4
+    tracker.propagate(gray_thumbnail(field[:, 40:680]))
+    assert tracker.needs_detection()
+
+
+def test_with_track_ids_and_stream_trackers():
+    output = with_track_ids([{'class': 'Weed'}, {'class': 'Paddy'}], np.array([7, 9]))
+    assert [item['track_id'] for item in output] == [7, 9]
+
+    trackers = StreamTrackers(keyframe_interval=2, max_streams=1)
+    tracker, lock = trackers.get('a')
+    assert trackers.get('a')[0] is tracker and tracker.keyframe_interval == 2
+    trackers.get('b')
+    assert trackers.totals('a') is None and trackers.totals('b')['frames'] == 0
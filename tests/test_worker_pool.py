@@ -0,0 +1,28 @@
+import sys
+
+import numpy as np
+import pytest
+
+import inference_worker
+from worker_pool import InferencePool, _worker_entry_main
+
+
+def test_workers_are_spawned_with_the_small_entry_module_as_main():
+    main = sys.modules['__main__']
+    with _worker_entry_main():
+        assert sys.modules['__main__'] is inference_worker
+    assert sys.modules['__main__'] is main
+
+
+def test_pool_runs_frames_on_worker_processes():
+    pytest.importorskip('torch')
+    from model_loader import STAND_IN_BACKEND
+
+    pool = InferencePool(1, {'weights': 'missing.pt', 'backend': STAND_IN_BACKEND})
+    try:
+        results = pool.submit(np.zeros((48, 64, 3), dtype=np.uint8), timeout=60)
+        assert results.xyxy[0].shape[1] == 6
+        stats = pool.stats()
+        assert stats['per_worker'][0]['tasks'] == 1 and stats['per_worker'][0]['alive']
+    finally:
+        pool.stop()
@@ -0,0 +1,89 @@
+import numpy as np
+
+from admission import check_deadline
+from postprocess import detections_array
+
+DEFAULT_TILE_SIZE = 640
+DEFAULT_TILE_OVERLAP = 0.2
+DEFAULT_MERGE_THRESHOLD = 0.6
+DEFAULT_MAX_IN_FLIGHT = 8  # One full batch of the batching engine
+
+
+def tile_windows(height, width, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_TILE_OVERLAP):
+    """Return (x0, y0, x1, y1) windows of at most tile_size that cover the image with the given overlap fraction"""
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)  # Last tile flush with the edge
+        return positions
+
+    return [
+        (x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height))
+        for y0 in starts(height) for x0 in starts(width)
+    ]
+
+
+def merge_detections(det, threshold=DEFAULT_MERGE_THRESHOLD):
+    """Class-aware greedy NMS using intersection over the smaller box
+
+    Intersection-over-smaller also merges the truncated copy of a plant cut by a
+    tile seam with the full box from the neighbouring tile, which plain IoU misses.
+    """
+    if len(det) == 0:
+        return det
+
+    order = np.argsort(-det[:, 4])
+    det = det[order]
+    x1, y1, x2, y2 = det[:, 0], det[:, 1], det[:, 2], det[:, 3]
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    classes = det[:, 5]
+
+    keep = []
+    remaining = np.arange(len(det))
+    while remaining.size:
+        i = remaining[0]
+        keep.append(i)
+        rest = remaining[1:]
+        iw = np.maximum(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0)
+        ih = np.maximum(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0)
+        smaller = np.maximum(np.minimum(areas[i], areas[rest]), 1e-6)
+        overlap = (iw * ih) / smaller
+        suppressed = (overlap > threshold) & (classes[rest] == classes[i])
+        remaining = rest[~suppressed]
+    return det[keep]
+
+
+def tiled_inference(engine, image, tile_size=None, overlap=DEFAULT_TILE_OVERLAP,
+                    merge_threshold=DEFAULT_MERGE_THRESHOLD, size=None, deadline=None, profile=None,
+                    max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Detect on overlapping tiles of a BGR image and return (detections in image coordinates, tile count)
+
+    `tile_size` defaults to the inference size, so tiles reach the model at their
+    native resolution. Tiles are queued on the batching engine `max_in_flight` at
+    a time, enough to fill a batch without one large image flooding the queue,
+    and the deadline is checked before each group.
+    """
+    tile_size = tile_size or size or DEFAULT_TILE_SIZE
+    height, width = image.shape[:2]
+    windows = tile_windows(height, width, tile_size, overlap)
+
+    # Tiles are views into the decoded image; [..., ::-1] hands the model RGB like a file path would
+    tiles = [image[y0:y1, x0:x1, ::-1] for x0, y0, x1, y1 in windows]
+    results = []
+    for start in range(0, len(tiles), max_in_flight):
+        check_deadline(deadline)
+        results.extend(engine.submit_many(tiles[start:start + max_in_flight], size=size, deadline=deadline,
+                                          profile=profile))
+
+    per_tile = []
+    for (x0, y0, _, _), result in zip(windows, results):
+        det = detections_array(result).copy()
+        det[:, [0, 2]] += x0
+        det[:, [1, 3]] += y0
+        per_tile.append(det)
+
+    det = np.concatenate(per_tile) if per_tile else np.zeros((0, 6), dtype=np.float32)
+    return merge_detections(det, merge_threshold), len(windows)
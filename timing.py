@@ -0,0 +1,117 @@
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Histogram bucket upper bounds in milliseconds (Prometheus style, +Inf is implicit)
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class StageTimer:
+    """Per-request wall-clock timer for named processing stages"""
+
+    def __init__(self):
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def add_model_times(self, results):
+        """Record the preprocess / forward pass / NMS split reported by YOLOv5 (ms per image)"""
+        model_times = getattr(results, 't', None)
+        if model_times and len(model_times) == 3:
+            for name, ms in zip(('preprocess', 'forward', 'nms'), model_times):
+                self.add(name, float(ms))
+
+    def total_ms(self):
+        return (time.perf_counter() - self._start) * 1000
+
+    def as_dict(self):
+        return {name: round(ms, 2) for name, ms in self.stages.items()}
+
+
+class _StageStats:
+    def __init__(self, window):
+        self.count = 0
+        self.sum_ms = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.samples = deque(maxlen=window)
+
+    def observe(self, ms):
+        self.count += 1
+        self.sum_ms += ms
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.samples.append(ms)
+
+    def summary(self):
+        samples = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        if samples.size:
+            p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        else:
+            p50 = p95 = p99 = 0.0
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum_ms / self.count, 2) if self.count else 0,
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'max_ms': round(float(samples.max()), 2) if samples.size else 0
+        }
+
+
+class LatencyRegistry:
+    """Aggregate per-endpoint stage timings into histograms and percentiles"""
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, timer):
+        """Record every stage of a finished request plus its end-to-end total"""
+        stages = dict(timer.stages)
+        stages['total'] = timer.total_ms()
+        with self._lock:
+            for stage, ms in stages.items():
+                key = (endpoint, stage)
+                if key not in self._stats:
+                    self._stats[key] = _StageStats(self.window)
+                self._stats[key].observe(ms)
+
+    def snapshot(self):
+        """Return {endpoint: {stage: summary}} with percentiles over the recent window"""
+        with self._lock:
+            result = {}
+            for (endpoint, stage), stats in self._stats.items():
+                result.setdefault(endpoint, {})[stage] = stats.summary()
+            return result
+
+    def prometheus_text(self):
+        """Render the histograms in the Prometheus text exposition format"""
+        lines = [
+            '# HELP weed_detector_stage_latency_ms Per-stage request latency in milliseconds',
+            '# TYPE weed_detector_stage_latency_ms histogram'
+        ]
+        with self._lock:
+            for (endpoint, stage), stats in sorted(self._stats.items()):
+                labels = f'endpoint="{endpoint}",stage="{stage}"'
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS_MS, stats.bucket_counts):
+                    cumulative += count
+                    lines.append(f'weed_detector_stage_latency_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'weed_detector_stage_latency_ms_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f'weed_detector_stage_latency_ms_sum{{{labels}}} {stats.sum_ms:.3f}')
+                lines.append(f'weed_detector_stage_latency_ms_count{{{labels}}} {stats.count}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,254 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from motion_gate import THUMBNAIL_WIDTH
+from postprocess import WEED_CLASS, weed_density
+
+DEFAULT_IOU_THRESHOLD = 0.3
+DEFAULT_MAX_MISSED = 5  # Keyframes a track may go undetected before it is dropped
+DEFAULT_MIN_HITS = 2  # Keyframes a track must be detected in to count towards the unique totals
+MIN_SHIFT_RESPONSE = 0.05  # Below this phase-correlation peak the shift estimate is ignored
+
+
+def gray_thumbnail(frame, width=THUMBNAIL_WIDTH):
+    """Small greyscale copy of a decoded BGR frame, the same size as motion_gate.frame_thumbnail's"""
+    height = max(1, round(frame.shape[0] * width / frame.shape[1]))
+    small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def estimate_shift(previous, current):
+    """Global (dx, dy) translation of the view between two thumbnails, in thumbnail pixels
+
+    Plants do not move; what moves is the camera, so one phase-correlation shift
+    per frame carries every box along with it.
+    """
+    if previous is None or current is None or previous.shape != current.shape:
+        return 0.0, 0.0
+    previous = np.float32(previous)
+    current = np.float32(current)
+    window = cv2.createHanningWindow(current.shape[::-1], cv2.CV_32F)
+    (dx, dy), response = cv2.phaseCorrelate(previous, current, window)
+    if response < MIN_SHIFT_RESPONSE:
+        return 0.0, 0.0
+    return dx, dy
+
+
+def box_iou_matrix(a, b):
+    """Pairwise IoU between (n, 4) and (m, 4) xyxy boxes"""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def greedy_match(iou, threshold):
+    """Pair rows and columns by descending IoU; returns [(row, col), ...] above the threshold"""
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind='stable')
+    used_rows, used_cols, pairs = set(), set(), []
+    for row, col in zip(rows[order].tolist(), cols[order].tolist()):
+        if row not in used_rows and col not in used_cols:
+            used_rows.add(row)
+            used_cols.add(col)
+            pairs.append((row, col))
+    return pairs
+
+
+class Tracker:
+    """IoU association of detections across frames, with stable track IDs
+
+    The detector only needs to run on keyframes (every `keyframe_interval` frames).
+    On the frames in between, the boxes are moved by the camera shift estimated
+    from small greyscale thumbnails. On keyframes, the moved boxes are matched to
+    the new detections by IoU. A track's class is the majority of its detections,
+    so a plant that flips between Weed and Paddy is still counted once.
+    """
+
+    def __init__(self, keyframe_interval=1, iou_threshold=DEFAULT_IOU_THRESHOLD, max_missed=DEFAULT_MAX_MISSED,
+                 min_hits=DEFAULT_MIN_HITS):
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.min_hits = min_hits
+
+        # Track state as parallel arrays so shifting and matching stay vectorized
+        self._boxes = np.zeros((0, 4), dtype=np.float32)
+        self._conf = np.zeros(0, dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._hits = np.zeros(0, dtype=np.int64)
+        self._missed = np.zeros(0, dtype=np.int64)
+        self._votes = np.zeros((0, 2), dtype=np.int64)  # [weed, paddy] detections per track
+        self._finished = np.zeros((0, 2), dtype=np.int64)  # Votes and hits of dropped tracks, for the totals
+        self._finished_hits = np.zeros(0, dtype=np.int64)
+
+        self._next_id = 1
+        self._thumbnail = None
+        self._frame_size = None  # (width, height) of the last keyframe
+        self.frames = 0
+        self.keyframes = 0
+        self._since_keyframe = 0
+
+    def needs_detection(self):
+        """Whether the next frame is a keyframe the detector should run on"""
+        return self._frame_size is None or self._since_keyframe + 1 >= self.keyframe_interval
+
+    def _move(self, thumbnail):
+        # Shift every box by the camera motion since the previous frame
+        if thumbnail is not None and self._thumbnail is not None and self._frame_size is not None:
+            dx, dy = estimate_shift(self._thumbnail, thumbnail)
+            scale = self._frame_size[0] / thumbnail.shape[1]
+            self._boxes += np.float32([dx, dy, dx, dy]) * scale
+        if thumbnail is not None:
+            self._thumbnail = thumbnail
+
+    def _drop(self, keep):
+        gone = ~keep
+        self._finished = np.concatenate([self._finished, self._votes[gone]])
+        self._finished_hits = np.concatenate([self._finished_hits, self._hits[gone]])
+        self._boxes, self._conf, self._ids = self._boxes[keep], self._conf[keep], self._ids[keep]
+        self._hits, self._missed, self._votes = self._hits[keep], self._missed[keep], self._votes[keep]
+
+    def update(self, det, thumbnail=None, frame_size=None):
+        """Keyframe: match (n, 6) detections to the tracks; returns (det, track_ids) for this frame"""
+        det = np.asarray(det, dtype=np.float32).reshape(-1, 6)
+        self.frames += 1
+        self.keyframes += 1
+        self._since_keyframe = 0
+        self._move(thumbnail)
+        if frame_size is not None:
+            self._frame_size = frame_size
+
+        pairs = greedy_match(box_iou_matrix(self._boxes, det[:, :4]), self.iou_threshold)
+        matched_tracks = np.array([t for t, _ in pairs], dtype=np.int64)
+        matched_dets = np.array([d for _, d in pairs], dtype=np.int64)
+        weed = det[:, 5].astype(np.int64) == WEED_CLASS
+
+        # Matched tracks take the detected box; the rest count a miss
+        self._missed += 1
+        if len(pairs):
+            self._boxes[matched_tracks] = det[matched_dets, :4]
+            self._conf[matched_tracks] = det[matched_dets, 4]
+            self._hits[matched_tracks] += 1
+            self._missed[matched_tracks] = 0
+            np.add.at(self._votes, (matched_tracks, np.where(weed[matched_dets], 0, 1)), 1)
+
+        # Unmatched detections start new tracks
+        new = np.setdiff1d(np.arange(len(det)), matched_dets)
+        ids = np.zeros(len(det), dtype=np.int64)
+        if len(new):
+            new_ids = np.arange(self._next_id, self._next_id + len(new))
+            self._next_id += len(new)
+            votes = np.zeros((len(new), 2), dtype=np.int64)
+            votes[np.arange(len(new)), np.where(weed[new], 0, 1)] = 1
+            self._boxes = np.concatenate([self._boxes, det[new, :4]])
+            self._conf = np.concatenate([self._conf, det[new, 4]])
+            self._ids = np.concatenate([self._ids, new_ids])
+            self._hits = np.concatenate([self._hits, np.ones(len(new), dtype=np.int64)])
+            self._missed = np.concatenate([self._missed, np.zeros(len(new), dtype=np.int64)])
+            self._votes = np.concatenate([self._votes, votes])
+            ids[new] = new_ids
+        if len(pairs):
+            ids[matched_dets] = self._ids[matched_tracks]
+
+        self._drop((self._missed <= self.max_missed) & self._in_view())
+        return det, ids
+
+    def propagate(self, thumbnail):
+        """Between keyframes: move the tracks with the camera; returns (det, track_ids) of the visible tracks"""
+        self.frames += 1
+        self._since_keyframe += 1
+        self._move(thumbnail)
+        self._drop(self._in_view())
+        return self.current()
+
+    def current(self):
+        """(det, track_ids) of the tracks detected on the last keyframe, at their current positions"""
+        visible = self._missed == 0
+        det = np.empty((int(visible.sum()), 6), dtype=np.float32)
+        det[:, :4] = self._boxes[visible]
+        det[:, 4] = self._conf[visible]
+        det[:, 5] = np.where(self._votes[visible, 0] >= self._votes[visible, 1], WEED_CLASS, 1 - WEED_CLASS)
+        return det, self._ids[visible]
+
+    def _in_view(self):
+        # Tracks carried completely out of the frame by the camera are finished
+        if self._frame_size is None:
+            return np.ones(len(self._boxes), dtype=bool)
+        width, height = self._frame_size
+        boxes = self._boxes
+        return (boxes[:, 2] > 0) & (boxes[:, 3] > 0) & (boxes[:, 0] < width) & (boxes[:, 1] < height)
+
+    def totals(self):
+        """Unique weeds and paddy seen so far (tracks confirmed on at least `min_hits` keyframes)"""
+        votes = np.concatenate([self._finished, self._votes])
+        hits = np.concatenate([self._finished_hits, self._hits])
+        # A clip with fewer keyframes than min_hits still counts what it saw
+        confirmed = votes[hits >= min(self.min_hits, max(self.keyframes, 1))]
+        weeds = int((confirmed[:, 0] >= confirmed[:, 1]).sum())
+        return {
+            'unique_weeds': weeds,
+            'unique_paddy': len(confirmed) - weeds,
+            'unique_weed_density': weed_density(weeds, len(confirmed) - weeds),
+            'tracks': self._next_id - 1,
+            'active_tracks': int((self._missed == 0).sum()),
+            'frames': self.frames,
+            'keyframes': self.keyframes
+        }
+
+
+def with_track_ids(output, track_ids):
+    """Add each detection's track id to the API output list from summarize_detections"""
+    for item, track_id in zip(output, track_ids.tolist()):
+        item['track_id'] = track_id
+    return output
+
+
+class StreamTrackers:
+    """One Tracker per live stream id, forgetting streams that go quiet"""
+
+    def __init__(self, keyframe_interval=1, max_streams=256, stream_ttl=300, **tracker_options):
+        self.keyframe_interval = keyframe_interval
+        self.max_streams = max_streams
+        self.stream_ttl = stream_ttl
+        self.tracker_options = tracker_options
+
+        self._trackers = OrderedDict()  # stream_id -> (tracker, lock, last_seen)
+        self._lock = threading.Lock()
+
+    def get(self, stream_id):
+        """Return (tracker, lock) for the stream; hold the lock while using the tracker"""
+        now = time.time()
+        with self._lock:
+            entry = self._trackers.pop(stream_id, None)
+            if entry is None:
+                entry = (Tracker(self.keyframe_interval, **self.tracker_options), threading.Lock(), now)
+            self._trackers[stream_id] = (entry[0], entry[1], now)
+            for key, (_, _, last_seen) in list(self._trackers.items()):
+                if len(self._trackers) <= self.max_streams and now - last_seen <= self.stream_ttl:
+                    break
+                del self._trackers[key]
+            return entry[0], entry[1]
+
+    def totals(self, stream_id):
+        with self._lock:
+            entry = self._trackers.get(stream_id)
+        if entry is None:
+            return None
+        with entry[1]:
+            return entry[0].totals()
+
+    def stats(self):
+        with self._lock:
+            stream_ids = list(self._trackers)
+        return {stream_id: self.totals(stream_id) for stream_id in stream_ids}
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+import threading
+import time
+
+# Only files the store named itself are ever evicted; anything else in the folder is left alone
+STORED_NAME = re.compile(r'^(predicted_)?[0-9a-f]{16}\.[a-z0-9]+$')
+
+
+def _extension(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return ext if re.fullmatch(r'\.[a-z0-9]+', ext) else '.jpg'
+
+
+class UploadStore:
+    """Content-addressed upload folder: identical images are stored once, with a disk quota and TTL/LRU eviction
+
+    Originals are named by the SHA-256 of their bytes and annotated outputs by the
+    result cache key, so same-named uploads no longer overwrite each other. File
+    mtime doubles as last-use time; `touch` refreshes it whenever a file is served.
+    """
+
+    def __init__(self, root, quota_bytes=2 * 1024 ** 3, ttl_seconds=7 * 24 * 3600, sweep_interval=60,
+                 min_age_seconds=60):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self.min_age_seconds = min_age_seconds  # Grace period so files of in-flight requests are never evicted
+
+        self._lock = threading.Lock()
+        self._counters = {'writes': 0, 'dedup_hits': 0, 'bytes_written': 0, 'bytes_deduplicated': 0,
+                          'ttl_evictions': 0, 'quota_evictions': 0, 'bytes_reclaimed': 0, 'sweeps': 0}
+        self._last_sweep = None
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def original_name(image_bytes, filename):
+        return hashlib.sha256(image_bytes).hexdigest()[:16] + _extension(filename)
+
+    @staticmethod
+    def annotated_name(key, filename):
+        return 'predicted_' + key[:16] + _extension(filename)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def save(self, name, data):
+        """Write `data` under `name` unless an identical file is already stored"""
+        path = self.path(name)
+        if self.touch(name):
+            with self._lock:
+                self._counters['dedup_hits'] += 1
+                self._counters['bytes_deduplicated'] += len(data)
+            return path
+
+        # Atomic replace: concurrent writers of the same content never expose a partial file
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._counters['writes'] += 1
+            self._counters['bytes_written'] += len(data)
+        return path
+
+    def touch(self, name):
+        """Mark a stored file as recently used; False if it is not on disk"""
+        try:
+            os.utime(self.path(name))
+            return True
+        except OSError:
+            return False
+
+    def _stored_files(self):
+        files = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and STORED_NAME.match(entry.name):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _remove(self, path, size, reason):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self._counters[reason] += 1
+            self._counters['bytes_reclaimed'] += size
+        return True
+
+    def sweep(self, now=None):
+        """Drop files unused for longer than the TTL, then least recently used files until under the quota"""
+        now = now or time.time()
+        files = sorted(self._stored_files())
+        kept = []
+        for mtime, size, path in files:
+            if self.ttl_seconds and now - mtime > self.ttl_seconds:
+                self._remove(path, size, 'ttl_evictions')
+            else:
+                kept.append((mtime, size, path))
+
+        total = sum(size for _, size, _ in kept)
+        for mtime, size, path in kept:
+            if total <= self.quota_bytes:
+                break
+            if now - mtime < self.min_age_seconds:
+                break  # Everything left is newer still
+            if self._remove(path, size, 'quota_evictions'):
+                total -= size
+
+        with self._lock:
+            self._counters['sweeps'] += 1
+            self._last_sweep = now
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Upload store sweep failed: {e}")
+
+    def start(self):
+        """Run sweeps every `sweep_interval` seconds on a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='upload-sweeper', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        files = self._stored_files()
+        with self._lock:
+            counters = dict(self._counters)
+            last_sweep = self._last_sweep
+        return {
+            **counters,
+            'files': len(files),
+            'bytes_stored': sum(size for _, size, _ in files),
+            'quota_bytes': self.quota_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'seconds_since_sweep': round(time.time() - last_sweep, 1) if last_sweep else None
+        }
@@ -0,0 +1,78 @@
+import queue
+import threading
+
+import cv2
+
+
+def sampling_stride(capture, stride=None, sample_fps=None):
+    """Work out how many frames to advance per sample from an explicit stride or a target FPS"""
+    if stride:
+        return max(1, int(stride))
+    if sample_fps:
+        video_fps = capture.get(cv2.CAP_PROP_FPS) or 0
+        if video_fps > 0:
+            return max(1, int(round(video_fps / float(sample_fps))))
+    return 1
+
+
+def iter_video_frames(path, stride=None, sample_fps=None, prefetch=8):
+    """Yield (frame_index, timestamp, frame) for sampled frames, decoding in a background thread
+
+    The decoder runs ahead of the consumer by up to `prefetch` frames so decoding and
+    inference overlap instead of alternating. A decoding error is raised in the
+    consumer after the frames decoded before it.
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError('Could not open video file')
+
+    step = sampling_stride(capture, stride, sample_fps)
+    video_fps = capture.get(cv2.CAP_PROP_FPS) or 0
+    frames = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+
+    def decode():
+        try:
+            index = 0
+            while not stop.is_set():
+                # grab() skips the full decode for frames that are not sampled
+                if not capture.grab():
+                    break
+                if index % step == 0:
+                    ok, frame = capture.retrieve()
+                    if not ok:
+                        raise ValueError(f'Could not decode frame {index}')
+                    timestamp = index / video_fps if video_fps else None
+                    while not stop.is_set():
+                        try:
+                            frames.put((index, timestamp, frame), timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                index += 1
+        except Exception as e:
+            # Handed to the consumer, which re-raises it instead of ending the stream as if complete
+            frames.put(e)
+        finally:
+            capture.release()
+            frames.put(done)
+
+    decoder = threading.Thread(target=decode, name='video-decoder', daemon=True)
+    decoder.start()
+    try:
+        while True:
+            item = frames.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stop the decoder if the consumer goes away early (e.g. client disconnect)
+        stop.set()
+        while decoder.is_alive():
+            try:
+                frames.get_nowait()
+            except queue.Empty:
+                decoder.join(timeout=0.1)
@@ -0,0 +1,227 @@
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import inference_worker
+from admission import DeadlineExceeded
+
+
+class WorkerResult:
+    """Minimal stand-in for YOLOv5 Detections carrying one image's boxes back from a worker"""
+
+    def __init__(self, det, times):
+        self.xyxy = [det]
+        self.t = times
+
+
+@contextmanager
+def _worker_entry_main():
+    # Spawn re-imports __main__ in the child; with app.py as __main__ that would rerun the app's startup
+    main = sys.modules['__main__']
+    sys.modules['__main__'] = inference_worker
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+
+class _Worker:
+    def __init__(self, index, slot):
+        self.index = index
+        self.slot = slot
+        self.process = None
+        self.conn = None
+        self.startup = {}
+        self.tasks = 0
+        self.errors = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+
+
+class InferencePool:
+    """Pool of inference processes, each with its own model copy, fed frames through shared memory"""
+
+    def __init__(self, workers=2, model_kwargs=None, torch_threads=None, slot_bytes=16 * 1024 * 1024,
+                 ready_timeout=300):
+        self.num_workers = workers
+        self.model_kwargs = model_kwargs or {}
+        self.torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.slot_bytes = slot_bytes
+        self.ready_timeout = ready_timeout
+
+        self._context = multiprocessing.get_context('spawn')
+        self._workers = []
+        self._idle = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        """Spawn the workers and wait until every model is loaded (called lazily on first use)"""
+        with self._start_lock:
+            if self._started:
+                return
+            for index in range(self.num_workers):
+                slot = shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+                worker = _Worker(index, slot)
+                self._workers.append(worker)
+                self._spawn(worker)
+                self._idle.put(worker)
+            self._started = True
+
+    def _spawn(self, worker):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=inference_worker.run,
+            args=(child_conn, worker.slot.name, self.model_kwargs, self.torch_threads),
+            name=f'inference-worker-{worker.index}',
+            daemon=True
+        )
+        with _worker_entry_main():
+            process.start()
+        child_conn.close()
+
+        if not parent_conn.poll(self.ready_timeout):
+            process.kill()
+            raise RuntimeError(f'Inference worker {worker.index} did not become ready')
+        status, payload = parent_conn.recv()
+        if status != 'ready':
+            process.join()
+            raise RuntimeError(f'Inference worker {worker.index} failed to load the model: {payload}')
+
+        worker.process = process
+        worker.conn = parent_conn
+        worker.startup = payload
+        worker.started_at = time.time()
+        worker.busy_seconds = 0.0
+
+    def _restart(self, worker):
+        if worker.process is not None and worker.process.is_alive():
+            worker.process.kill()
+        if worker.conn is not None:
+            worker.conn.close()
+        worker.restarts += 1
+        print(f"Restarting inference worker {worker.index} (restart #{worker.restarts})")
+        self._spawn(worker)
+
+    def _run_on(self, worker, image, timeout, size):
+        extra = None
+        if isinstance(image, str):
+            message = ('path', image, size)
+        else:
+            image = np.asarray(image)
+            if image.nbytes <= self.slot_bytes:
+                target, name = worker.slot, None
+            else:
+                # Oversized frame: one-off block, unlinked as soon as the worker answers
+                extra = shared_memory.SharedMemory(create=True, size=image.nbytes)
+                target, name = extra, extra.name
+            # Single copy straight from the (possibly strided) source into shared memory
+            np.ndarray(image.shape, dtype=image.dtype, buffer=target.buf)[...] = image
+            message = ('frame', (image.shape, image.dtype.str, name), size)
+
+        start = time.perf_counter()
+        try:
+            worker.conn.send(message)
+            if timeout is not None and not worker.conn.poll(timeout):
+                raise TimeoutError(f'Inference worker {worker.index} timed out')
+            status, payload = worker.conn.recv()
+        finally:
+            worker.busy_seconds += time.perf_counter() - start
+            if extra is not None:
+                extra.close()
+                extra.unlink()
+
+        worker.tasks += 1
+        if status != 'ok':
+            worker.errors += 1
+            raise RuntimeError(payload)
+        det, times = payload
+        return WorkerResult(det, times)
+
+    def submit(self, image, timeout=None, size=None, deadline=None, profile=None, priority='bulk'):
+        """Run one image (path or array) on the next idle worker at `size` (None: model default) and return its detections
+
+        If no worker frees up before `deadline` (time.monotonic() value) it fails
+        with DeadlineExceeded instead of reaching a model. `profile` and `priority`
+        are accepted for parity with the batching engine: the forward pass runs in
+        another process, so a request profile only sees the time spent waiting for
+        it, and idle workers are handed out in arrival order.
+        """
+        self.start()
+        wait = timeout
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0)
+            wait = remaining if timeout is None else min(timeout, remaining)
+        try:
+            worker = self._idle.get(timeout=wait)
+        except queue.Empty:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise DeadlineExceeded('Request deadline passed before inference') from None
+            raise
+        try:
+            if not worker.process.is_alive():
+                self._restart(worker)
+            try:
+                return self._run_on(worker, image, timeout, size)
+            except (EOFError, OSError, TimeoutError) as e:
+                # Crashed or hung mid-request: replace the process, but do not replay a frame that may have caused it
+                self._restart(worker)
+                raise RuntimeError(f'Inference worker {worker.index} failed: {str(e) or type(e).__name__}') from e
+        finally:
+            self._idle.put(worker)
+
+    def submit_many(self, images, timeout=None, size=None, deadline=None, profile=None, priority='bulk'):
+        """Spread several images across the workers and wait for all of them"""
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            return list(executor.map(lambda image: self.submit(image, timeout, size, deadline), images))
+
+    def profile_threads(self):
+        # Inference happens in the worker processes; there is no local thread to sample
+        return {}
+
+    def stats(self):
+        """Per-worker utilization (busy time / uptime), task counts and restarts"""
+        now = time.time()
+        workers = []
+        for worker in self._workers:
+            uptime = now - worker.started_at if worker.started_at else 0
+            workers.append({
+                'index': worker.index,
+                'pid': worker.process.pid if worker.process else None,
+                'alive': bool(worker.process and worker.process.is_alive()),
+                'tasks': worker.tasks,
+                'errors': worker.errors,
+                'restarts': worker.restarts,
+                'busy_seconds': round(worker.busy_seconds, 3),
+                'utilization': round(worker.busy_seconds / uptime, 4) if uptime else 0,
+                'time_to_ready_seconds': worker.startup.get('time_to_ready_seconds')
+            })
+        return {
+            'mode': 'pool',
+            'workers': self.num_workers,
+            'torch_threads_per_worker': self.torch_threads,
+            'idle_workers': self._idle.qsize(),
+            'started': self._started,
+            'per_worker': workers
+        }
+
+    def stop(self):
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, AttributeError):
+                pass
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+            worker.slot.close()
+            worker.slot.unlink()